@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 
-from appointment.models import Appointment, Prescription
+from appointment.models import Appointment, AppointmentArchive, Prescription, SlotOccurrence
 
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
@@ -25,3 +25,29 @@ class AppointmentAdmin(admin.ModelAdmin):
     def time_link(self, obj):
         url = reverse('admin:user_timeslot_change', args=[obj.time.id])
         return format_html('<a href="{}">{}</a>', url, obj.time)
+
+
+@admin.register(SlotOccurrence)
+class SlotOccurrenceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'time_link', 'date',
+                    'capacity', 'reserved', 'next_number')
+    list_filter = ('date',)
+    list_display_links = ('id', )
+    ordering = ('date', 'time')
+
+    def time_link(self, obj):
+        url = reverse('admin:user_timeslot_change', args=[obj.time.id])
+        return format_html('<a href="{}">{}</a>', url, obj.time)
+
+
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'month', 'appointment_count', 'archived_at')
+    exclude = ('data',)
+    ordering = ('month',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
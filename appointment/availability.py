@@ -0,0 +1,180 @@
+import math
+import random
+import time as clock
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from user.models import TimeSlot
+
+from .booking import next_appointment_date
+from .models import SlotOccurrence
+
+
+def medic_availability(medic, today=None):
+    """
+    Return the active time slots of `medic`, each carrying the date of its
+    next occurrence and the places still free on it.
+
+    Costs two queries however many weekdays the medic works.
+    """
+    times = list(TimeSlot.objects.filter(medic=medic, is_active=True)
+                 .select_related('medic__user', 'clinic')
+                 .order_by('day_of_week'))
+
+    dates = {time.id: next_appointment_date(time, today) for time in times}
+
+    occurrences = SlotOccurrence.objects.filter(
+        time__in=times, date__in=set(dates.values())
+    ).values_list('time_id', 'date', 'capacity', 'reserved')
+
+    remaining = {
+        (time_id, date): max(capacity - reserved, 0)
+        for time_id, date, capacity, reserved in occurrences
+    }
+
+    for time in times:
+        time.appointment_date = dates[time.id]
+        time.remaining = remaining.get(
+            (time.id, time.appointment_date), time.avg_patient_visit or 0)
+
+    return times
+
+
+def medic_calendar(medic, start, end):
+    """
+    Return the places still free on every occurrence between `start` and
+    `end` of each active time slot of `medic`, one list per time slot
+    with an entry per week starting at `first_date`.
+    """
+    times = TimeSlot.objects.filter(medic=medic, is_active=True)\
+        .order_by('day_of_week')
+
+    occurrences = SlotOccurrence.objects.filter(
+        time__medic=medic, time__is_active=True, date__range=(start, end)
+    ).values_list('time_id', 'date', 'capacity', 'reserved')
+
+    remaining = {
+        (time_id, date): max(capacity - reserved, 0)
+        for time_id, date, capacity, reserved in occurrences
+    }
+
+    calendar = []
+    for time in times:
+        first_date = start + \
+            timedelta(days=(time.day_of_week - start.weekday()) % 7)
+        weeks = (end - first_date).days // 7 + 1 if first_date <= end else 0
+
+        calendar.append({
+            'id': time.id,
+            'clinic': time.clinic_id,
+            'day_of_week': time.day_of_week,
+            'start_time': time.start_time,
+            'end_time': time.end_time,
+            'avg_visit_time': time.avg_visit_time,
+            'first_date': first_date,
+            'remaining': [
+                remaining.get((time.id, first_date + timedelta(weeks=week)),
+                              time.avg_patient_visit or 0)
+                for week in range(weeks)
+            ],
+        })
+
+    return calendar
+
+
+def earliest_available(specialization, start, end, clinic=None, limit=10):
+    """
+    Return the `limit` earliest time slots with a free place between
+    `start` and `end` among accepted medics of `specialization`.
+
+    Runs as one query ordered by date over the open occurrences index,
+    so the merge of every medic's calendar happens in the database.
+    """
+    occurrences = SlotOccurrence.objects.filter(
+        date__range=(start, end),
+        reserved__lt=F('capacity'),
+        time__is_active=True,
+        time__medic__accepted=True,
+        time__medic__specialization__iexact=specialization,
+        time__clinic__accepted=True,
+    )
+
+    if clinic is not None:
+        occurrences = occurrences.filter(time__clinic=clinic)
+
+    occurrences = occurrences.select_related(
+        'time__medic__user', 'time__clinic'
+    ).order_by('date', 'time__start_time', 'id')[:limit]
+
+    times = []
+    for occurrence in occurrences:
+        time = occurrence.time
+        time.appointment_date = occurrence.date
+        time.remaining = occurrence.remaining
+        times.append(time)
+
+    return times
+
+
+def availability_version(medic_id):
+    key = f'availability:{medic_id}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_medic_availability(medic_id):
+    cache.set(f'availability:{medic_id}:version', uuid4().hex, None)
+
+
+def cached_availability(medic_id, name, compute):
+    """
+    Return the cached result of `compute` for `medic_id`, computing it
+    when missing.
+
+    Only the caller holding the lock recomputes, the others wait for it
+    on a miss. Entries are refreshed early with a probability growing as
+    they near expiry, so a popular medic's entry never expires for every
+    reader at the same moment.
+    """
+    key = f'availability:{medic_id}:{availability_version(medic_id)}:{name}'
+    lock_key = f'{key}:lock'
+    timeout = settings.AVAILABILITY_CACHE_TIMEOUT
+    lock_timeout = settings.AVAILABILITY_CACHE_LOCK_TIMEOUT
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        early = delta * -math.log(1 - random.random())
+        if clock.time() + early < expires_at:
+            return value
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            return value
+
+    else:
+        locked = cache.add(lock_key, 1, lock_timeout)
+        deadline = clock.time() + lock_timeout
+        while not locked and clock.time() < deadline:
+            clock.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+
+    try:
+        started = clock.time()
+        value = compute()
+        finished = clock.time()
+        cache.set(key, (value, finished - started, finished + timeout),
+                  timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+    return value
@@ -0,0 +1,293 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from rest_framework import serializers
+
+from medical_records.models import MedicalRecord
+
+from .models import Appointment, Prescription, SlotOccurrence
+from .reservations import SlotFull, SlotReservations
+
+
+def next_appointment_date(time, today=None):
+    today = today or timezone.localdate()
+
+    day_difference = time.day_of_week - today.weekday()
+    if day_difference <= 0:
+        day_difference += 7
+
+    return today + timedelta(days=day_difference)
+
+
+def booking_date(time, date=None):
+    """
+    Return the date a booking of `time` is for, checking a requested
+    `date` falls on the slot's weekday inside the booking window.
+    """
+    if date is None:
+        return next_appointment_date(time)
+
+    today = timezone.localdate()
+    if date.weekday() != time.day_of_week:
+        raise serializers.ValidationError(
+            'The date does not match the day of this appointment time.')
+
+    if not today < date <= today + timedelta(weeks=settings.BOOKING_WINDOW_WEEKS):
+        raise serializers.ValidationError(
+            'The date is outside the booking window.')
+
+    return date
+
+
+def first_free_number(taken_numbers):
+    number = 1
+    for taken in sorted(taken_numbers):
+        if taken > number:
+            break
+        if taken == number:
+            number += 1
+    return number
+
+
+def reserved_numbers(time, date):
+    return list(Appointment.objects.filter(time=time).on_date(date)
+                .values_list('appointment_number', flat=True))
+
+
+def occurrence_counters(numbers):
+    return {
+        'reserved': len(numbers),
+        'next_number': first_free_number(numbers),
+    }
+
+
+def lock_occurrence(time, date):
+    """
+    Return the occurrence of `time` on `date` locked for update, creating
+    it from the appointments already booked when it does not exist yet.
+    """
+    occurrences = SlotOccurrence.objects.select_related('time')\
+        .select_for_update(of=('self',))
+
+    occurrence = occurrences.filter(time=time, date=date).first()
+    if occurrence is None:
+        occurrence, created = occurrences.get_or_create(
+            time=time, date=date,
+            defaults={
+                'capacity': time.avg_patient_visit or 0,
+                **occurrence_counters(reserved_numbers(time, date)),
+            })
+
+    return occurrence
+
+
+def place_datetime(time, date, number):
+    start_time = timezone.make_aware(datetime.combine(date, time.start_time))
+    return start_time + timedelta(minutes=(number - 1) * time.avg_visit_time)
+
+
+def create_appointment(time, patient, date, number, short_description=''):
+    medical_record, created = MedicalRecord.objects.get_or_create(
+        medic_id=time.medic_id, patient=patient)
+    prescription = Prescription.objects.create()
+
+    return Appointment.objects.create(
+        patient=patient,
+        time=time,
+        short_description=short_description,
+        medical_record=medical_record,
+        prescription=prescription,
+        appointment_datetime=place_datetime(time, date, number),
+        appointment_number=number,
+    )
+
+
+def place_appointment(appointment, time, date, number):
+    """
+    Put `appointment` on place `number` of `time` on `date`, along with
+    the medic, clinic and medical record of the slot.
+    """
+    medical_record, created = MedicalRecord.objects.get_or_create(
+        medic_id=time.medic_id, patient_id=appointment.patient_id)
+
+    appointment.time = time
+    appointment.medic_id = time.medic_id
+    appointment.clinic_id = time.clinic_id
+    appointment.medical_record = medical_record
+    appointment.appointment_datetime = place_datetime(time, date, number)
+    appointment.appointment_number = number
+    appointment.save()
+    return appointment
+
+
+def take_place(time, appointment_date):
+    """
+    Take the next free place of `time` on `appointment_date` and return
+    the slot with the number of the place. Must run in a transaction, which
+    holds the occurrence's row lock until it ends.
+    """
+    occurrence = lock_occurrence(time, appointment_date)
+    time = occurrence.time
+
+    if not time.is_active:
+        raise serializers.ValidationError(
+            'No Medic appointment time matches.'
+        )
+
+    if occurrence.capacity <= occurrence.reserved:
+        raise serializers.ValidationError(
+            'You cannot reserve this appointment; it is fully booked.')
+
+    appointment_number = occurrence.next_number
+
+    if occurrence.next_number == occurrence.reserved + 1:
+        occurrence.next_number += 1
+    else:
+        # A cancelled place was handed out, look for the next gap.
+        occurrence.next_number = first_free_number(
+            reserved_numbers(time, appointment_date) + [appointment_number])
+
+    occurrence.reserved += 1
+    occurrence.save(update_fields=['reserved', 'next_number'])
+
+    return time, appointment_number
+
+
+def take_redis_place(time, appointment_date):
+    """
+    Take the next free place of `time` on `appointment_date` from the Redis
+    counters and return its number along with the next free one.
+    """
+    if not time.is_active:
+        raise serializers.ValidationError(
+            'No Medic appointment time matches.'
+        )
+
+    reservations = SlotReservations()
+
+    try:
+        reservation = reservations.reserve(time, appointment_date)
+        if reservation is None:
+            reservations.reset(time.id, appointment_date,
+                               reserved_numbers(time, appointment_date),
+                               only_if_missing=True)
+            reservation = reservations.reserve(time, appointment_date)
+    except SlotFull:
+        raise serializers.ValidationError(
+            'You cannot reserve this appointment; it is fully booked.')
+
+    return reservation
+
+
+def record_redis_place(time, appointment_date, next_free):
+    """
+    Mirror a place taken in Redis on the occurrence's counters.
+    """
+    if not SlotOccurrence.objects.filter(
+            time=time, date=appointment_date).update(
+            reserved=F('reserved') + 1, next_number=next_free):
+        lock_occurrence(time, appointment_date)
+
+
+def book_appointment(time, patient, short_description='', date=None):
+    """
+    Reserve the next free place of `time` on `date`, by default its next
+    occurrence, for `patient`.
+
+    With the database backend the whole booking runs in one transaction
+    holding a row lock on the slot occurrence, so concurrent bookings of
+    the same (time, date) are serialized and can never hand out the same
+    number or go past its capacity.
+    """
+    if settings.BOOKING_BACKEND == 'redis':
+        return book_appointment_with_redis(
+            time, patient, short_description, date)
+
+    appointment_date = booking_date(time, date)
+
+    with transaction.atomic():
+        time, appointment_number = take_place(time, appointment_date)
+        return create_appointment(time, patient, appointment_date,
+                                  appointment_number, short_description)
+
+
+def book_appointment_with_redis(time, patient, short_description='', date=None):
+    """
+    Take the place from the Redis counters first and only then write the
+    appointment, so concurrent bookings never wait on a database lock.
+    """
+    appointment_date = booking_date(time, date)
+    appointment_number, next_free = take_redis_place(time, appointment_date)
+
+    try:
+        with transaction.atomic():
+            appointment = create_appointment(
+                time, patient, appointment_date, appointment_number,
+                short_description)
+            record_redis_place(time, appointment_date, next_free)
+    except Exception:
+        SlotReservations().release(time.id, appointment_date, appointment_number)
+        raise
+
+    return appointment
+
+
+def move_appointment(appointment, time, date=None):
+    """
+    Move `appointment` to the next free place of `time` on `date`, by
+    default its next occurrence, and give its old place back, in one
+    transaction as a booking would.
+    """
+    appointment_date = booking_date(time, date)
+
+    if appointment.time_id == time.id and appointment.appointment_datetime \
+            and timezone.localdate(appointment.appointment_datetime) == appointment_date:
+        return appointment
+
+    if settings.BOOKING_BACKEND == 'redis':
+        appointment_number, next_free = take_redis_place(time, appointment_date)
+        try:
+            with transaction.atomic():
+                release_appointment(appointment)
+                place_appointment(
+                    appointment, time, appointment_date, appointment_number)
+                record_redis_place(time, appointment_date, next_free)
+        except Exception:
+            SlotReservations().release(time.id, appointment_date, appointment_number)
+            raise
+
+        return appointment
+
+    with transaction.atomic():
+        release_appointment(appointment)
+        time, appointment_number = take_place(time, appointment_date)
+        return place_appointment(
+            appointment, time, appointment_date, appointment_number)
+
+
+def release_appointment(appointment):
+    """
+    Give the place of a cancelled appointment back to its occurrence.
+    """
+    if appointment.appointment_datetime is None:
+        return
+
+    time_id = appointment.time_id
+    appointment_date = timezone.localdate(appointment.appointment_datetime)
+    appointment_number = appointment.appointment_number
+
+    if settings.BOOKING_BACKEND == 'redis':
+        transaction.on_commit(lambda: SlotReservations().release(
+            time_id, appointment_date, appointment_number))
+
+    SlotOccurrence.objects.filter(
+        time_id=time_id,
+        date=appointment_date,
+    ).update(
+        reserved=Greatest(F('reserved') - 1, Value(0)),
+        next_number=Least(F('next_number'), Value(appointment_number)),
+    )
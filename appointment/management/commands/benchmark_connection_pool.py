@@ -0,0 +1,56 @@
+from statistics import quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from appointment_system.pools import pool_metrics
+
+
+class Command(BaseCommand):
+    help = ('Compare the latency of GET requests served with and without the '
+            'connection pool. Each request ends by releasing its connection, '
+            'as after a real request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--url', default=reverse('clinic-list'))
+
+    def handle(self, *args, requests, url, **options):
+        pool = connection.settings_dict['OPTIONS'].get('pool')
+        if not pool:
+            self.stderr.write('The default database has no pool configured.')
+            return
+
+        for label, options in [('no pool', None), ('pool', pool)]:
+            latencies = self.measure(url, requests, options)
+            p50, p95 = (quantiles(latencies, n=100)[index] for index in (49, 94))
+            self.stdout.write(
+                f'{label:8} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  '
+                f'mean {sum(latencies) / len(latencies):7.2f} ms')
+
+        stats = pool_metrics()[connection.alias]
+        self.stdout.write(
+            f"pool     size {stats['pool_size']}/{stats['pool_max']}  "
+            f"checkouts {stats.get('requests_num', 0)}  "
+            f"mean wait {stats['checkout_wait_ms']:.2f} ms")
+
+    def measure(self, url, requests, pool):
+        connection.close()
+        connection.close_pool()
+        connection.settings_dict['OPTIONS']['pool'] = pool
+
+        client = Client()
+        latencies = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for _ in range(requests):
+                start = perf_counter()
+                response = client.get(url)
+                connection.close()
+                latencies.append((perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.status_code
+
+        return latencies
@@ -0,0 +1,111 @@
+import json
+from datetime import time as datetime_time, timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from appointment.models import Appointment
+from clinic.models import Clinic
+from user.models import Medic, Patient, TimeSlot, User
+
+SEED_SQL = """
+INSERT INTO appointment_prescription (prescription_number, drugs)
+SELECT '', '' FROM generate_series(1, %(rows)s);
+
+INSERT INTO appointment_appointment (
+    patient_id, time_id, medic_id, clinic_id, prescription_id,
+    short_description, appointment_datetime, appointment_number)
+SELECT %(patient)s,
+       (%(times)s::int[])[1 + n %% %(slots)s],
+       (%(medics)s::int[])[1 + n %% %(slots)s],
+       %(clinic)s, id, '',
+       %(start)s + n * %(step)s * interval '1 second',
+       1 + n / %(slots)s %% 1000
+FROM (SELECT id, row_number() OVER (ORDER BY id) AS n
+      FROM appointment_prescription WHERE id > %(last)s) AS prescriptions;
+
+ANALYZE appointment_appointment;
+"""
+
+
+def plan_summary(queryset):
+    explain = json.loads(queryset.explain(format='json', analyze=True))[0]
+
+    nodes, plan = [], explain['Plan']
+    while plan:
+        nodes.append(plan['Node Type'] + (
+            f" using {plan['Index Name']}" if 'Index Name' in plan else ''))
+        plan = (plan.get('Plans') or [None])[0]
+
+    return ' -> '.join(nodes), explain['Execution Time']
+
+
+class Command(BaseCommand):
+    help = ('Compare appointment_datetime__date lookups with the date range '
+            'filters on a seeded appointments table. Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--slots', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            time = self.seed(**options)
+            date = timezone.localdate() + timedelta(days=1)
+
+            queries = {
+                'send_appointment_sms': (
+                    Appointment.objects.filter(appointment_datetime__date=date),
+                    Appointment.objects.on_date(date)),
+                'reserved_numbers': (
+                    Appointment.objects.filter(
+                        time=time, appointment_datetime__date=date),
+                    Appointment.objects.filter(time=time).on_date(date)),
+            }
+
+            for name, (lookup, date_range) in queries.items():
+                self.stdout.write(name)
+                for label, queryset in [('__date', lookup), ('range', date_range)]:
+                    nodes, duration = plan_summary(queryset)
+                    self.stdout.write(
+                        f'  {label:7} {duration:10.2f} ms  {nodes}')
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows, days, slots, **options):
+        key = uuid4().hex[:8]
+        clinic = Clinic.objects.create(
+            name='benchmark', clinic_serial=f'benchmark-{key}')
+        patient = Patient.objects.create(user=User.objects.create_user(
+            phone_number=f'b{key}-patient'))
+
+        times = []
+        for index in range(slots):
+            medic = Medic.objects.create(
+                user=User.objects.create_user(phone_number=f'b{key}-{index}'),
+                specialization='benchmark', medical_system_number=str(index))
+            times.append(TimeSlot.objects.create(
+                medic=medic, clinic=clinic, day_of_week=0,
+                start_time=datetime_time(9), end_time=datetime_time(17),
+                avg_visit_time=10))
+
+        start = timezone.now() - timedelta(days=days // 2)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM appointment_prescription')
+            last, = cursor.fetchone()
+            cursor.execute(SEED_SQL, {
+                'rows': rows,
+                'last': last,
+                'slots': slots,
+                'times': [time.id for time in times],
+                'medics': [time.medic_id for time in times],
+                'patient': patient.id,
+                'clinic': clinic.id,
+                'start': start,
+                'step': days * 86400 / rows,
+            })
+
+        return times[0]
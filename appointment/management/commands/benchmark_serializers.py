@@ -0,0 +1,66 @@
+from datetime import time as datetime_time
+from timeit import repeat
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointment.models import Appointment, Prescription
+from appointment.serializers import CompiledRetrieveAppointmentSerializer, RetrieveAppointmentSerializer
+from clinic.models import Clinic
+from medical_records.models import MedicalRecord
+from user.models import Medic, Patient, TimeSlot, User
+
+
+def build_appointments(rows):
+    """
+    Unsaved appointments with their whole read graph attached, so the
+    benchmark measures serialization only.
+    """
+    medic = Medic(id=1, specialization='heart', medical_system_number='1234',
+                  user=User(id=1, phone_number='09120000000',
+                            first_name='reza', last_name='rezaei', age=40))
+    clinic = Clinic(id=1, name='clinic', clinic_serial='1')
+    time = TimeSlot(id=1, medic=medic, clinic=clinic, day_of_week=0,
+                    start_time=datetime_time(9), end_time=datetime_time(12),
+                    avg_visit_time=15, avg_patient_visit=rows)
+    now = timezone.now()
+
+    appointments = []
+    for index in range(1, rows + 1):
+        patient = Patient(
+            id=index, address='address', blood_group='O+',
+            user=User(id=index + 1, phone_number=f'0935{index:07}',
+                      first_name='ali', last_name='alavi', age=30))
+        appointments.append(Appointment(
+            id=index, patient=patient, time=time,
+            short_description='checkup', appointment_datetime=now,
+            appointment_number=index,
+            prescription=Prescription(id=index, drugs='aspirin'),
+            medical_record=MedicalRecord(id=index, medic=medic,
+                                         patient=patient,
+                                         illnes_subject='flu')))
+    return appointments
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF and compiled appointment read serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        appointments = build_appointments(options['rows'])
+
+        def timing(serializer_class):
+            return min(repeat(
+                lambda: serializer_class(appointments, many=True).data,
+                number=1, repeat=options['repeat']))
+
+        drf = timing(RetrieveAppointmentSerializer)
+        compiled = timing(CompiledRetrieveAppointmentSerializer)
+
+        self.stdout.write(f'rows:     {len(appointments)}')
+        self.stdout.write(f'drf:      {drf * 1000:.1f} ms')
+        self.stdout.write(f'compiled: {compiled * 1000:.1f} ms')
+        self.stdout.write(f'speedup:  {drf / compiled:.1f}x')
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0012_rename_appointment_appointment_prescription'),
+        ('user', '0022_alter_medic_image_alter_timeslot_avg_visit_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('capacity', models.PositiveSmallIntegerField(verbose_name='capacity')),
+                ('reserved', models.PositiveSmallIntegerField(default=0, verbose_name='reserved')),
+                ('next_number', models.PositiveSmallIntegerField(default=1, verbose_name='next_number')),
+                ('time', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='user.timeslot')),
+            ],
+            options={
+                'unique_together': {('time', 'date')},
+            },
+        ),
+    ]
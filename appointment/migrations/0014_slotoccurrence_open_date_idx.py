@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0013_slotoccurrence'),
+        ('user', '0022_alter_medic_image_alter_timeslot_avg_visit_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='slotoccurrence',
+            index=models.Index(condition=models.Q(('reserved__lt', models.F('capacity'))), fields=['date'], name='slot_occurrence_open_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0014_slotoccurrence_open_date_idx'),
+        ('medical_records', '0009_delete_prescription'),
+        ('user', '0022_alter_medic_image_alter_timeslot_avg_visit_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_datetime', 'id'], name='appointment_datetime_id_idx'),
+        ),
+    ]
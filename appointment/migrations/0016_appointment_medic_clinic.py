@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0015_appointment_datetime_id_idx'),
+        ('clinic', '0004_clinic_name'),
+        ('medical_records', '0009_delete_prescription'),
+        ('user', '0022_alter_medic_image_alter_timeslot_avg_visit_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='clinic',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='appointments', to='clinic.clinic'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='medic',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='appointments', to='user.medic'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['medic', 'appointment_datetime'], name='appointment_medic_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['clinic', 'appointment_datetime'], name='appointment_clinic_dt_idx'),
+        ),
+    ]
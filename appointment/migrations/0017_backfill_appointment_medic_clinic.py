@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfill_medic_clinic(apps, schema_editor):
+    Appointment = apps.get_model('appointment', 'Appointment')
+    TimeSlot = apps.get_model('user', 'TimeSlot')
+
+    times = TimeSlot.objects.filter(id=OuterRef('time_id'))
+    last_id = 0
+
+    while True:
+        ids = list(Appointment.objects.filter(
+            id__gt=last_id, medic__isnull=True
+        ).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+
+        if not ids:
+            break
+
+        Appointment.objects.filter(id__in=ids).update(
+            medic_id=Subquery(times.values('medic_id')[:1]),
+            clinic_id=Subquery(times.values('clinic_id')[:1]),
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own so the table is never locked at once.
+    atomic = False
+
+    dependencies = [
+        ('appointment', '0016_appointment_medic_clinic'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_medic_clinic, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0017_backfill_appointment_medic_clinic'),
+        ('clinic', '0004_clinic_name'),
+        ('medical_records', '0010_medical_record_medic_patient_idx'),
+        ('user', '0023_medic_specialization_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_datetime'], name='appointment_patient_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['time', 'appointment_datetime'], name='appointment_time_dt_idx'),
+        ),
+    ]
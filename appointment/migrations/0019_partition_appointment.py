@@ -0,0 +1,136 @@
+from datetime import date, datetime, time as datetime_time
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'appointment_appointment'
+MONTHS_AHEAD = 4
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def month_start_datetime(month):
+    return timezone.make_aware(datetime.combine(month, datetime_time()))
+
+
+def table_definition(cursor):
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes '
+        'WHERE schemaname = current_schema() AND tablename = %s', [TABLE])
+    indexes = cursor.fetchall()
+
+    cursor.execute(
+        'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+        'WHERE conrelid = %s::regclass', [TABLE])
+    constraints = cursor.fetchall()
+
+    return indexes, constraints
+
+
+def replace_table(cursor, create_sql):
+    """
+    Set the appointment table aside and create its replacement with
+    `create_sql`.
+    """
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_old')
+    cursor.execute(create_sql)
+    return f'{TABLE}_old'
+
+
+def fill_table(cursor, old_table):
+    """
+    Copy the rows over, carry the id sequence on and drop the old table.
+    """
+    cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old_table}')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)")
+    cursor.execute(f'DROP TABLE {old_table}')
+
+
+def partition_appointments(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        indexes, constraints = table_definition(cursor)
+
+        old_table = replace_table(cursor, (
+            f'CREATE TABLE {TABLE} (LIKE {TABLE}_old INCLUDING DEFAULTS '
+            f'INCLUDING IDENTITY INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (appointment_datetime)'))
+
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'SELECT MIN(appointment_datetime) FROM {old_table}')
+        first, = cursor.fetchone()
+        month = timezone.localdate().replace(day=1)
+        last = add_months(month, MONTHS_AHEAD)
+        if first is not None:
+            month = min(month, timezone.localdate(first).replace(day=1))
+
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month_start_datetime(month),
+                 month_start_datetime(add_months(month, 1))])
+            month = add_months(month, 1)
+
+        fill_table(cursor, old_table)
+
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+        # Unique indexes of a partitioned table must hold the partition key.
+        for name, definition in indexes:
+            if name == f'{TABLE}_pkey':
+                cursor.execute(
+                    f'CREATE UNIQUE INDEX {TABLE}_id_uniq '
+                    f'ON {TABLE} (id, appointment_datetime)')
+            else:
+                cursor.execute(definition.replace('CREATE UNIQUE INDEX', 'CREATE INDEX'))
+
+
+def merge_appointments(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        indexes, constraints = table_definition(cursor)
+
+        old_table = replace_table(cursor, (
+            f'CREATE TABLE {TABLE} (LIKE {TABLE}_old INCLUDING DEFAULTS '
+            f'INCLUDING IDENTITY INCLUDING CONSTRAINTS)'))
+        fill_table(cursor, old_table)
+
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id)')
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+        for name, definition in indexes:
+            if name == f'{TABLE}_id_uniq':
+                continue
+            if '(prescription_id)' in definition:
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} UNIQUE (prescription_id)')
+            else:
+                cursor.execute(definition)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0018_appointment_patient_time_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_appointments, merge_appointments),
+    ]
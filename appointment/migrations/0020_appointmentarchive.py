@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+READ_ONLY_SQL = """
+CREATE FUNCTION appointment_archive_read_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'archived appointments are read-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_archive_read_only
+BEFORE UPDATE ON appointment_appointmentarchive
+FOR EACH ROW EXECUTE FUNCTION appointment_archive_read_only();
+
+-- The data is gzipped already, keep Postgres from compressing it again.
+ALTER TABLE appointment_appointmentarchive ALTER COLUMN data SET STORAGE EXTERNAL;
+"""
+
+DROP_READ_ONLY_SQL = """
+DROP TRIGGER appointment_archive_read_only ON appointment_appointmentarchive;
+DROP FUNCTION appointment_archive_read_only();
+"""
+
+
+def make_read_only(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(READ_ONLY_SQL)
+
+
+def drop_read_only(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_READ_ONLY_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0019_partition_appointment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='month')),
+                ('appointment_count', models.PositiveIntegerField(verbose_name='appointment_count')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='archived_at')),
+            ],
+        ),
+        migrations.RunPython(make_read_only, drop_read_only),
+    ]
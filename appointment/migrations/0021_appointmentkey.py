@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+KEYS_SQL = """
+CREATE FUNCTION appointment_sync_keys() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        DELETE FROM appointment_appointmentkey WHERE appointment_id = OLD.id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO appointment_appointmentkey (appointment_id, prescription_id)
+        VALUES (NEW.id, NEW.prescription_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_sync_keys
+AFTER INSERT OR DELETE ON appointment_appointment
+FOR EACH ROW EXECUTE FUNCTION appointment_sync_keys();
+
+CREATE TRIGGER appointment_sync_changed_keys
+AFTER UPDATE OF id, prescription_id ON appointment_appointment
+FOR EACH ROW
+WHEN (OLD.id IS DISTINCT FROM NEW.id OR OLD.prescription_id IS DISTINCT FROM NEW.prescription_id)
+EXECUTE FUNCTION appointment_sync_keys();
+
+INSERT INTO appointment_appointmentkey (appointment_id, prescription_id)
+SELECT id, prescription_id FROM appointment_appointment;
+"""
+
+DROP_KEYS_SQL = """
+DROP TRIGGER appointment_sync_changed_keys ON appointment_appointment;
+DROP TRIGGER appointment_sync_keys ON appointment_appointment;
+DROP FUNCTION appointment_sync_keys();
+"""
+
+
+def sync_keys(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(KEYS_SQL)
+
+
+def drop_keys(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_KEYS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0020_appointmentarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentKey',
+            fields=[
+                ('appointment_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='appointment_id')),
+                ('prescription_id', models.BigIntegerField(unique=True, verbose_name='prescription_id')),
+            ],
+        ),
+        migrations.RunPython(sync_keys, drop_keys),
+    ]
@@ -0,0 +1,100 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+APPEND_ONLY_SQL = """
+DROP TRIGGER appointment_archive_read_only ON appointment_appointmentarchive;
+
+CREATE TRIGGER appointment_archive_read_only
+BEFORE UPDATE OR DELETE ON appointment_appointmentarchive
+FOR EACH ROW EXECUTE FUNCTION appointment_archive_read_only();
+
+CREATE TRIGGER appointment_archive_chunk_read_only
+BEFORE UPDATE OR DELETE ON appointment_appointmentarchivechunk
+FOR EACH ROW EXECUTE FUNCTION appointment_archive_read_only();
+
+-- The data is gzipped already, keep Postgres from compressing it again.
+ALTER TABLE appointment_appointmentarchivechunk ALTER COLUMN data SET STORAGE EXTERNAL;
+"""
+
+DROP_APPEND_ONLY_SQL = """
+DROP TRIGGER appointment_archive_chunk_read_only ON appointment_appointmentarchivechunk;
+DROP TRIGGER appointment_archive_read_only ON appointment_appointmentarchive;
+
+CREATE TRIGGER appointment_archive_read_only
+BEFORE UPDATE ON appointment_appointmentarchive
+FOR EACH ROW EXECUTE FUNCTION appointment_archive_read_only();
+"""
+
+
+def make_append_only(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(APPEND_ONLY_SQL)
+
+
+def drop_append_only(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_APPEND_ONLY_SQL)
+
+
+def split_archives(apps, schema_editor):
+    AppointmentArchive = apps.get_model('appointment', 'AppointmentArchive')
+    AppointmentArchiveChunk = apps.get_model('appointment', 'AppointmentArchiveChunk')
+
+    for archive in AppointmentArchive.objects.iterator():
+        AppointmentArchiveChunk.objects.create(
+            archive=archive, number=0, data=archive.data)
+
+    # Leave no deferred foreign key checks pending for dropping the column.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def join_archives(apps, schema_editor):
+    AppointmentArchive = apps.get_model('appointment', 'AppointmentArchive')
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE appointment_appointmentarchive '
+            'DISABLE TRIGGER appointment_archive_read_only')
+    for archive in AppointmentArchive.objects.iterator():
+        archive.data = b''.join(bytes(data) for data in archive.chunks.order_by(
+            'number').values_list('data', flat=True))
+        archive.save(update_fields=['data'])
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE appointment_appointmentarchive '
+            'ENABLE TRIGGER appointment_archive_read_only')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0021_appointmentkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchiveChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='number')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='chunks', to='appointment.appointmentarchive')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('archive', 'number'), name='appointment_archive_chunk_uniq')],
+            },
+        ),
+        # Nullable first, so that going back can add it to existing rows.
+        migrations.AlterField(
+            model_name='appointmentarchive',
+            name='data',
+            field=models.BinaryField(null=True, verbose_name='data'),
+        ),
+        migrations.RunPython(split_archives, join_archives),
+        migrations.RemoveField(
+            model_name='appointmentarchive',
+            name='data',
+        ),
+        migrations.RunPython(make_append_only, drop_append_only),
+    ]
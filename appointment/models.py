@@ -1,11 +1,19 @@
+import json
+import zlib
+from datetime import datetime, time as datetime_time, timedelta
+
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from clinic.models import Clinic
 from medical_records.models import MedicalRecord
-from user.models import Patient, TimeSlot
+from outbox.models import OutboxMixin
+from user.models import Medic, Patient, TimeSlot
 
 
-class Prescription(models.Model):
+class Prescription(OutboxMixin, models.Model):
     prescription_number = models.CharField(
         _('prescription_number')
     )
@@ -15,7 +23,39 @@ class Prescription(models.Model):
     )
 
 
-class Appointment(models.Model):
+def day_start(date):
+    return timezone.make_aware(datetime.combine(date, datetime_time()))
+
+
+def days_condition(start, end):
+    return Q(appointment_datetime__gte=day_start(start),
+             appointment_datetime__lt=day_start(end))
+
+
+class AppointmentQuerySet(models.QuerySet):
+    """
+    Date filters as half-open ranges of `appointment_datetime` in the
+    current timezone. Unlike `appointment_datetime__date`, they compare the
+    column itself, so its indexes can be used.
+    """
+
+    def between(self, start, end):
+        """
+        Appointments from the start of `start` up to the start of `end`.
+        """
+        return self.filter(days_condition(start, end))
+
+    def on_date(self, date):
+        return self.between(date, date + timedelta(days=1))
+
+    def on_dates(self, dates):
+        condition = Q()
+        for date in dates:
+            condition |= days_condition(date, date + timedelta(days=1))
+        return self.filter(condition) if condition else self.none()
+
+
+class Appointment(OutboxMixin, models.Model):
     patient = models.ForeignKey(
         Patient,
         on_delete=models.DO_NOTHING,
@@ -28,6 +68,23 @@ class Appointment(models.Model):
         related_name='appointments'
     )
 
+    # Copied from `time` so medic and clinic queries need no join.
+    medic = models.ForeignKey(
+        Medic,
+        on_delete=models.DO_NOTHING,
+        related_name='appointments',
+        blank=True,
+        null=True
+    )
+
+    clinic = models.ForeignKey(
+        Clinic,
+        on_delete=models.DO_NOTHING,
+        related_name='appointments',
+        blank=True,
+        null=True
+    )
+
     medical_record = models.ForeignKey(
         MedicalRecord,
         on_delete=models.DO_NOTHING,
@@ -58,5 +115,172 @@ class Appointment(models.Model):
         _('appointment_number'),
     )
 
+    objects = AppointmentQuerySet.as_manager()
+
+    outbox_fields = ['id', 'patient_id', 'medic_id', 'clinic_id', 'time_id',
+                     'appointment_datetime', 'appointment_number']
+
     def __str__(self) -> str:
-        return f'{self.patient} -> {self.time.medic} at {self.appointment_datetime} in {self.time.clinic}'
+        return f'{self.patient} -> {self.medic} at {self.appointment_datetime} in {self.clinic}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_loaded()
+
+    def remember_loaded(self):
+        # The slot and medic as stored, to tell when they are changed.
+        if 'time_id' in self.__dict__:
+            self._loaded_time_id = self.time_id
+        if 'medic_id' in self.__dict__:
+            self._loaded_medic_id = self.medic_id
+
+    def save(self, *args, **kwargs):
+        # Medic and clinic follow the time slot, also when it is changed.
+        # Moving to another slot with its place goes through
+        # booking.move_appointment.
+        if self.medic_id is None or self.clinic_id is None \
+                or self.time_id != getattr(self, '_loaded_time_id', self.time_id):
+            self.medic_id = self.time.medic_id
+            self.clinic_id = self.time.clinic_id
+        result = super().save(*args, **kwargs)
+        self.remember_loaded()
+        return result
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['appointment_datetime', 'id'],
+                name='appointment_datetime_id_idx'
+            ),
+            models.Index(
+                fields=['medic', 'appointment_datetime'],
+                name='appointment_medic_dt_idx'
+            ),
+            models.Index(
+                fields=['clinic', 'appointment_datetime'],
+                name='appointment_clinic_dt_idx'
+            ),
+            models.Index(
+                fields=['patient', 'appointment_datetime'],
+                name='appointment_patient_dt_idx'
+            ),
+            models.Index(
+                fields=['time', 'appointment_datetime'],
+                name='appointment_time_dt_idx'
+            ),
+        ]
+
+
+class SlotOccurrence(models.Model):
+    time = models.ForeignKey(
+        TimeSlot,
+        on_delete=models.CASCADE,
+        related_name='occurrences'
+    )
+
+    date = models.DateField(_('date'))
+
+    capacity = models.PositiveSmallIntegerField(
+        _('capacity'),
+    )
+
+    reserved = models.PositiveSmallIntegerField(
+        _('reserved'),
+        default=0
+    )
+
+    next_number = models.PositiveSmallIntegerField(
+        _('next_number'),
+        default=1
+    )
+
+    @property
+    def remaining(self):
+        return max(self.capacity - self.reserved, 0)
+
+    def __str__(self) -> str:
+        return f'{self.time} on {self.date} ({self.reserved}/{self.capacity})'
+
+    class Meta:
+        unique_together = ('time', 'date')
+        indexes = [
+            models.Index(
+                fields=['date'],
+                name='slot_occurrence_open_date_idx',
+                condition=models.Q(reserved__lt=models.F('capacity'))
+            ),
+        ]
+
+
+class AppointmentKey(models.Model):
+    """
+    The unique keys of appointments, which Postgres cannot enforce across
+    the partitions of their table. A trigger on it keeps this table in
+    step, so a second appointment with either key fails to insert.
+    """
+    appointment_id = models.BigIntegerField(
+        _('appointment_id'),
+        primary_key=True
+    )
+
+    prescription_id = models.BigIntegerField(
+        _('prescription_id'),
+        unique=True
+    )
+
+
+class AppointmentArchive(models.Model):
+    """
+    One month of past appointments, detached from the partitioned table
+    and kept as gzipped JSON lines split over AppointmentArchiveChunks.
+    Rows are never changed or deleted once written.
+    """
+    month = models.DateField(_('month'), unique=True)
+
+    appointment_count = models.PositiveIntegerField(
+        _('appointment_count'),
+    )
+
+    archived_at = models.DateTimeField(
+        _('archived_at'),
+        auto_now_add=True
+    )
+
+    def __str__(self) -> str:
+        return f'{self.month:%Y-%m}: {self.appointment_count} appointments'
+
+    def rows(self):
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        pending = b''
+        chunks = self.chunks.order_by('number').values_list('data', flat=True)
+        for data in chunks.iterator(chunk_size=1):
+            pending += decompressor.decompress(data)
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield json.loads(line)
+
+
+class AppointmentArchiveChunk(models.Model):
+    archive = models.ForeignKey(
+        AppointmentArchive,
+        on_delete=models.DO_NOTHING,
+        related_name='chunks'
+    )
+
+    number = models.PositiveIntegerField(_('number'))
+
+    data = models.BinaryField(_('data'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['archive', 'number'],
+                name='appointment_archive_chunk_uniq'
+            ),
+        ]
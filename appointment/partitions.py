@@ -0,0 +1,184 @@
+import gzip
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive, AppointmentArchiveChunk, AppointmentKey, day_start
+
+TABLE = Appointment._meta.db_table
+KEY_TABLE = AppointmentKey._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [TABLE])
+    partitioned, = cursor.fetchone()
+    return partitioned
+
+
+def partition_months(cursor):
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = %s::regclass', [TABLE])
+
+    months = []
+    for name, in cursor.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def lock_partitions(cursor):
+    cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [TABLE])
+
+
+def create_partition(cursor, month):
+    """
+    Attach the partition of `month`, moving in the rows the default
+    partition holds for it.
+    """
+    name = partition_name(month)
+    start, end = day_start(month), day_start(add_months(month, 1))
+
+    cursor.execute(
+        f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE appointment_datetime >= %s AND appointment_datetime < %s '
+        f'RETURNING *) INSERT INTO {name} SELECT * FROM moved', [start, end])
+    cursor.execute(
+        f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+        [start, end])
+    # Deleting the rows from the default partition dropped their keys.
+    cursor.execute(
+        f'INSERT INTO {KEY_TABLE} (appointment_id, prescription_id) '
+        f'SELECT id, prescription_id FROM {name}')
+    return name
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the missing monthly partitions from this month up to
+    `months_ahead` months ahead.
+    """
+    if months_ahead is None:
+        months_ahead = settings.APPOINTMENT_PARTITION_MONTHS_AHEAD
+
+    if connection.vendor != 'postgresql':
+        return []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return []
+
+        lock_partitions(cursor)
+        existing = set(partition_months(cursor))
+        this_month = timezone.localdate().replace(day=1)
+
+        return [create_partition(cursor, month)
+                for month in (add_months(this_month, offset)
+                              for offset in range(months_ahead + 1))
+                if month not in existing]
+
+
+class ChunkWriter:
+    """
+    File-like sink storing what is written to it as the chunks of
+    `archive`, `APPOINTMENT_ARCHIVE_CHUNK_SIZE` bytes each.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.buffer = bytearray()
+        self.number = 0
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= settings.APPOINTMENT_ARCHIVE_CHUNK_SIZE:
+            self.save_chunk()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def save_chunk(self):
+        if self.buffer:
+            AppointmentArchiveChunk.objects.create(
+                archive=self.archive, number=self.number, data=bytes(self.buffer))
+            self.buffer.clear()
+            self.number += 1
+
+
+def archive_partition(cursor, month):
+    """
+    Detach the partition of `month` and stream its rows into an
+    AppointmentArchive, gzipped as JSON lines.
+    """
+    name = partition_name(month)
+    cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+
+    cursor.execute(f'SELECT COUNT(*) FROM {name}')
+    count, = cursor.fetchone()
+    writer = ChunkWriter(AppointmentArchive.objects.create(
+        month=month, appointment_count=count))
+
+    with gzip.GzipFile(fileobj=writer, mode='wb') as archive, \
+            connection.chunked_cursor() as rows:
+        rows.execute(f'SELECT row_to_json(appointment)::text '
+                     f'FROM {name} AS appointment ORDER BY id')
+        for row, in rows:
+            archive.write(row.encode() + b'\n')
+    writer.save_chunk()
+
+    cursor.execute(
+        f'DELETE FROM {KEY_TABLE} WHERE appointment_id IN (SELECT id FROM {name})')
+    cursor.execute(f'DROP TABLE {name}')
+    return count
+
+
+def archive_partitions(keep_months=None):
+    """
+    Archive the monthly partitions older than the last `keep_months`
+    months, each in its own transaction.
+    """
+    if keep_months is None:
+        keep_months = settings.APPOINTMENT_HOT_MONTHS
+
+    if connection.vendor != 'postgresql':
+        return []
+
+    cutoff = add_months(timezone.localdate().replace(day=1), -keep_months)
+    archived = []
+
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return []
+
+        for month in partition_months(cursor):
+            if month >= cutoff:
+                break
+
+            with transaction.atomic():
+                lock_partitions(cursor)
+                if month not in partition_months(cursor):
+                    continue
+                archive_partition(cursor, month)
+            archived.append(partition_name(month))
+
+    return archived
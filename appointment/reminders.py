@@ -0,0 +1,203 @@
+import time as clock
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils import timezone
+
+from appointment_system.redis_client import get_redis
+from sms.dispatch import send_bulk_sms
+
+from .models import Appointment
+
+DIGEST_FIELDS = (
+    'medic_id',
+    'medic__user__phone_number',
+    'patient__user__first_name',
+    'patient__user__last_name',
+    'patient__user__phone_number',
+    'appointment_datetime',
+)
+
+
+# KEYS: due  ARGV: now, count
+POP_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+# KEYS: due  ARGV: now, then member and due time pairs
+# A reminder already due stays for the next tick, unless it was due at
+# another time, i.e. its appointment moved.
+SCHEDULE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local due = tonumber(ARGV[i + 1])
+    if due > tonumber(ARGV[1]) then
+        redis.call('ZADD', KEYS[1], due, ARGV[i])
+    else
+        local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+        if score and tonumber(score) ~= due then
+            redis.call('ZREM', KEYS[1], ARGV[i])
+        end
+    end
+end
+return 1
+"""
+
+
+def user_name(first_name, last_name, phone_number):
+    # As User.__str__ renders it.
+    if first_name and last_name:
+        return f'{first_name} {last_name}'
+    return str(phone_number)
+
+
+def medic_digests(date):
+    """
+    Yield the id and phone number of every medic with appointments on
+    `date` along with the lines of their digest, streamed from one query
+    ordered by medic.
+    """
+    rows = Appointment.objects.on_date(date)\
+        .order_by('medic_id', 'appointment_datetime', 'id')\
+        .values_list(*DIGEST_FIELDS)\
+        .iterator(chunk_size=settings.REMINDER_CHUNK_SIZE)
+
+    for medic_id, group in groupby(rows, key=itemgetter(0)):
+        phone_number, lines = None, []
+        for _, phone_number, first_name, last_name, patient_phone, at in group:
+            lines.append(f"- patient {user_name(first_name, last_name, patient_phone)} "
+                         f"at {timezone.localtime(at):%H:%M}")
+        yield medic_id, phone_number, lines
+
+
+class SentReminders:
+    """
+    Reminders already handed to the SMS pipeline, kept in Redis for
+    `REMINDER_DEDUP_SECONDS` so a retried or repeated task never sends
+    one twice.
+    """
+    key_prefix = 'reminders:sent'
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def claim(self, names):
+        """
+        Mark `names` as sent and return those that were not already.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for name in names:
+            pipe.set(f'{self.key_prefix}:{name}', 1, nx=True,
+                     ex=settings.REMINDER_DEDUP_SECONDS)
+        return [name for name, claimed in zip(names, pipe.execute()) if claimed]
+
+    def release(self, names):
+        if names:
+            self.client.delete(*[f'{self.key_prefix}:{name}' for name in names])
+
+
+class PatientReminders:
+    """
+    Upcoming patient reminders in a Redis sorted set, one member per
+    appointment and lead time in `PATIENT_REMINDER_LEADS`, scored by the
+    time it is due. Ticks pop what is due in batches, so no task waits in
+    the broker for a reminder.
+    """
+    key_prefix = 'reminders:patients'
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.due_key = f'{self.key_prefix}:due'
+        self._pop = self.client.register_script(POP_SCRIPT)
+        self._schedule = self.client.register_script(SCHEDULE_SCRIPT)
+
+    def members(self, appointment_id):
+        return [f'{appointment_id}:{lead}'
+                for lead in settings.PATIENT_REMINDER_LEADS]
+
+    def schedule(self, appointments, now=None):
+        """
+        Schedule the reminders of `appointments`, given as (id, datetime)
+        pairs, in place of their earlier ones. Reminders due already are
+        left to the next tick, or dropped if the appointment has moved.
+        """
+        now = clock.time() if now is None else now
+        args = [now]
+        for appointment_id, appointment_datetime in appointments:
+            at = appointment_datetime.timestamp() if appointment_datetime else 0
+            for lead in settings.PATIENT_REMINDER_LEADS:
+                args += [f'{appointment_id}:{lead}', at - lead]
+        if len(args) > 1:
+            self._schedule(keys=[self.due_key], args=args)
+
+    def cancel(self, appointment_ids):
+        members = [member for appointment_id in appointment_ids
+                   for member in self.members(appointment_id)]
+        if members:
+            self.client.zrem(self.due_key, *members)
+
+    def pop(self, count, now=None):
+        """
+        Remove and return up to `count` due reminders as (appointment id,
+        lead, due time) triples.
+        """
+        now = clock.time() if now is None else now
+        due = self._pop(keys=[self.due_key], args=[now, count])
+        return [(*(int(part) for part in member.split(b':')), float(score))
+                for member, score in zip(due[::2], due[1::2])]
+
+    def restore(self, reminders):
+        """
+        Put popped `reminders` back as they were.
+        """
+        if reminders:
+            self.client.zadd(self.due_key, {
+                f'{appointment_id}:{lead}': due for appointment_id, lead, due in reminders})
+
+
+def send_due_reminders(due):
+    """
+    Send the popped reminders `due` of appointments still upcoming, unless
+    an earlier tick already did, and return how many were sent.
+    """
+    now = timezone.now()
+    appointments = {
+        row[0]: row[1:] for row in Appointment.objects.filter(
+            id__in={appointment_id for appointment_id, lead, _ in due},
+            appointment_datetime__gt=now,
+        ).values_list(
+            'id', 'appointment_datetime', 'patient__user__phone_number',
+            'medic__user__first_name', 'medic__user__last_name',
+            'medic__user__phone_number')
+    }
+
+    # The appointment time is part of the name, so a rescheduled
+    # appointment is reminded again.
+    reminders = {
+        f'patient:{appointment_id}:{lead}:{appointments[appointment_id][0].timestamp():.0f}':
+            appointments[appointment_id]
+        for appointment_id, lead, _ in due if appointment_id in appointments
+    }
+    sent = SentReminders()
+    names = sent.claim(list(reminders))
+
+    messages = []
+    for name in names:
+        appointment_datetime, phone_number, *medic = reminders[name]
+        at = timezone.localtime(appointment_datetime)
+        messages.append({
+            'phone_number': phone_number,
+            'text': f'Reminder: your appointment with {user_name(*medic)} '
+                    f'is on {at:%Y-%m-%d} at {at:%H:%M}.'})
+
+    try:
+        send_bulk_sms(messages)
+    except Exception:
+        sent.release(names)
+        raise
+
+    return len(messages)
@@ -0,0 +1,156 @@
+import time as clock
+from datetime import date as datetime_date, datetime, time as datetime_time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from appointment_system.redis_client import get_redis
+
+
+# KEYS: counters, freed, pending  ARGV: capacity, now, expire_at
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-2, 0}
+end
+if tonumber(redis.call('HGET', KEYS[1], 'reserved')) >= tonumber(ARGV[1]) then
+    return {-1, 0}
+end
+
+local number
+local freed = redis.call('ZPOPMIN', KEYS[2])
+if #freed > 0 then
+    number = tonumber(freed[1])
+else
+    number = redis.call('HINCRBY', KEYS[1], 'next', 1) - 1
+end
+redis.call('HINCRBY', KEYS[1], 'reserved', 1)
+redis.call('ZADD', KEYS[3], ARGV[2], number)
+redis.call('EXPIREAT', KEYS[3], ARGV[3])
+
+local lowest = redis.call('ZRANGE', KEYS[2], 0, 0)
+if #lowest > 0 then
+    return {number, tonumber(lowest[1])}
+end
+return {number, tonumber(redis.call('HGET', KEYS[1], 'next'))}
+"""
+
+# KEYS: counters, freed, pending  ARGV: number
+RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if redis.call('ZADD', KEYS[2], ARGV[1], ARGV[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], 'reserved', -1)
+end
+return 1
+"""
+
+# KEYS: counters, freed, pending
+# ARGV: only_if_missing, now, grace, expire_at, booked numbers...
+RESET_SCRIPT = """
+if ARGV[1] == '1' and redis.call('EXISTS', KEYS[1]) == 1 then
+    return {-1, 0}
+end
+
+local taken = {}
+for i = 5, #ARGV do
+    taken[tonumber(ARGV[i])] = true
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', tonumber(ARGV[2]) - tonumber(ARGV[3]))
+for _, number in ipairs(redis.call('ZRANGE', KEYS[3], 0, -1)) do
+    taken[tonumber(number)] = true
+end
+
+local reserved, highest = 0, 0
+for number in pairs(taken) do
+    reserved = reserved + 1
+    if number > highest then
+        highest = number
+    end
+end
+
+local next_free = highest + 1
+redis.call('DEL', KEYS[2])
+for number = highest, 1, -1 do
+    if not taken[number] then
+        redis.call('ZADD', KEYS[2], number, number)
+        next_free = number
+    end
+end
+redis.call('HSET', KEYS[1], 'reserved', reserved, 'next', highest + 1)
+for i = 1, 3 do
+    redis.call('EXPIREAT', KEYS[i], ARGV[4])
+end
+return {reserved, next_free}
+"""
+
+
+class SlotFull(Exception):
+    pass
+
+
+class SlotReservations:
+    """
+    Place counters of every (time slot, date) kept in Redis.
+
+    Each reservation is a single script call, so the number handed out
+    and the capacity check are atomic without touching the database.
+    Numbers stay pending for `BOOKING_RESERVATION_GRACE` seconds, which
+    keeps reconciliation from giving back places whose appointment is
+    still being written.
+    """
+    key_prefix = 'booking'
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._reserve = self.client.register_script(RESERVE_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+        self._reset = self.client.register_script(RESET_SCRIPT)
+
+    def keys(self, time_id, date):
+        counters = f'{self.key_prefix}:{{{time_id}:{date.isoformat()}}}'
+        return [counters, f'{counters}:freed', f'{counters}:pending']
+
+    def expire_at(self, date):
+        end_of_day = datetime.combine(date + timedelta(days=1), datetime_time())
+        return int(timezone.make_aware(end_of_day).timestamp())
+
+    def reserve(self, time, date):
+        """
+        Return the number reserved for `time` on `date` and the lowest
+        number still free after it, or None if the counters are missing.
+        """
+        number, next_free = self._reserve(
+            keys=self.keys(time.id, date),
+            args=[time.avg_patient_visit or 0, clock.time(),
+                  self.expire_at(date)])
+
+        if number == -1:
+            raise SlotFull()
+        if number == -2:
+            return None
+        return number, next_free
+
+    def release(self, time_id, date, number):
+        self._release(keys=self.keys(time_id, date), args=[number])
+
+    def reset(self, time_id, date, numbers, only_if_missing=False):
+        """
+        Rebuild the counters from the booked `numbers` plus the
+        reservations made less than the grace period ago.
+        """
+        reserved, next_free = self._reset(
+            keys=self.keys(time_id, date),
+            args=[int(only_if_missing), clock.time(),
+                  settings.BOOKING_RESERVATION_GRACE,
+                  self.expire_at(date), *numbers])
+
+        if reserved == -1:
+            return None
+        return reserved, next_free
+
+    def scan(self):
+        for key in self.client.scan_iter(match=f'{self.key_prefix}:{{*}}'):
+            time_id, date = key.decode().split('{')[1].rstrip('}').split(':')
+            yield int(time_id), datetime_date.fromisoformat(date)
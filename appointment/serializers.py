@@ -1,91 +1,41 @@
-from datetime import timedelta, datetime
 from rest_framework import serializers
 
-from medical_records.models import MedicalRecord
+from appointment_system.serializers import CompiledReadSerializer
+from appointment_system.sparse import SparseFieldsMixin
 from medical_records.serializers import GETMedicalRecordSerializer
 from user.serializers import GETMedicAvailableTimeSerializer, PatientSerializer
 
+from .booking import book_appointment, move_appointment
 from .models import Appointment, Prescription
 
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Prescription
         fields = ['id', 'prescription_number', 'drugs']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     appointment_datetime = serializers.DateTimeField(read_only=True)
     appointment_number = serializers.IntegerField(read_only=True)
+    date = serializers.DateField(write_only=True, required=False)
 
     class Meta:
         model = Appointment
-        fields = ['id', 'patient', 'time', 'short_description',
+        fields = ['id', 'patient', 'time', 'short_description', 'date',
                   'appointment_datetime', 'appointment_number']
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        today = datetime.now()
-
-        time = validated_data['time']
-
-        if not time.is_active:
-            raise serializers.ValidationError(
-                'No Medic appointment time matches.'
-            )
-
-        time_day = time.day_of_week
-        day_difference = time_day - today.weekday()
-        if day_difference <= 0:
-            day_difference += 7
-
-        appointment_date = today + timedelta(days=day_difference)
-
-        appointment_reserved = Appointment.objects.filter(
-            appointment_datetime__date=appointment_date.date(), time=time
-        )
-
-        appointment_reserved_count = appointment_reserved.count()
-
-        if time.avg_patient_visit <= appointment_reserved_count:
-            raise serializers.ValidationError(
-                'You cannot reserve this appointment; it is fully booked.')
-
-        appointment_number = appointment_reserved_count + 1
-
-        start_time = datetime.combine(appointment_date.date(), time.start_time)
-
-        appointment_datetime = start_time + \
-            timedelta(minutes=appointment_reserved_count * time.avg_visit_time)
-
-        if Appointment.objects.filter(time=time).\
-                filter(appointment_datetime__gte=appointment_datetime).\
-                filter(appointment_datetime__lte=appointment_datetime+timedelta(minutes=time.avg_visit_time)).\
-                count():
-            raise serializers.ValidationError(
-                'You already have another appointment for this time.'
-            )
-
-        validated_data['appointment_datetime'] = appointment_datetime
-        validated_data['appointment_number'] = appointment_number
-        validated_data['patient'] = user.patient
-
-        medical_record, created = MedicalRecord.objects.get_or_create(
-            medic=time.medic, patient=user.patient)
-        prescription = Prescription.objects.create()
-
-        validated_data['medical_record'] = medical_record
-        validated_data['prescription'] = prescription
-
-        return super().create(validated_data)
+        validated_data['patient'] = self.context['request'].user.patient
+        return book_appointment(**validated_data)
 
     def save(self, **kwargs):
         kwargs['patient'] = self.context['request'].user.patient
         return super().save(**kwargs)
 
 
-class RetrieveAppointmentSerializer(serializers.ModelSerializer):
+class RetrieveAppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     prescription = PrescriptionSerializer()
     medical_record = GETMedicalRecordSerializer()
 
@@ -95,10 +45,29 @@ class RetrieveAppointmentSerializer(serializers.ModelSerializer):
                   'short_description', 'appointment_datetime', 'appointment_number']
 
 
-class UpdateAppointmentSerializer(serializers.ModelSerializer):
+class CompiledAppointmentSerializer(CompiledReadSerializer):
+    template = AppointmentSerializer
+
+
+class CompiledRetrieveAppointmentSerializer(CompiledReadSerializer):
+    template = RetrieveAppointmentSerializer
+
+
+class UpdateAppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
+    appointment_datetime = serializers.DateTimeField(read_only=True)
+    appointment_number = serializers.IntegerField(read_only=True)
+    date = serializers.DateField(write_only=True, required=False)
 
     class Meta:
         model = Appointment
-        fields = ['id', 'patient', 'time', 'short_description',
+        fields = ['id', 'patient', 'time', 'short_description', 'date',
                   'appointment_datetime', 'appointment_number']
+
+    def update(self, instance, validated_data):
+        # Another time slot or date is a new place, taken as bookings are.
+        time = validated_data.pop('time', instance.time)
+        date = validated_data.pop('date', None)
+        if time.id != instance.time_id or date is not None:
+            instance = move_appointment(instance, time, date)
+        return super().update(instance, validated_data)
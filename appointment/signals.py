@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from user.models import TimeSlot
+
+from .availability import invalidate_medic_availability
+from .booking import release_appointment
+from .models import Appointment, SlotOccurrence
+from .reminders import PatientReminders
+from .tasks import generate_slot_occurrences
+
+
+@receiver(post_delete, sender=Appointment)
+def release_cancelled_appointment(sender, instance, **kwargs):
+    release_appointment(instance)
+
+
+@receiver(post_save, sender=TimeSlot)
+def sync_slot_occurrences(sender, instance, created, **kwargs):
+    if not created:
+        occurrences = SlotOccurrence.objects.filter(
+            time=instance, date__gte=timezone.localdate())
+
+        # Empty occurrences left on another weekday by a day change.
+        occurrences.filter(reserved=0).exclude(
+            date__iso_week_day=instance.day_of_week + 1).delete()
+
+        occurrences.exclude(
+            capacity=instance.avg_patient_visit or 0
+        ).update(capacity=instance.avg_patient_visit or 0)
+
+    if instance.is_active:
+        transaction.on_commit(
+            lambda: generate_slot_occurrences(time_ids=[instance.id]))
+
+
+@receiver(post_save, sender=TimeSlot)
+def sync_appointment_medic_clinic(sender, instance, created, **kwargs):
+    # Upcoming appointments follow their time slot to its new medic or clinic.
+    if not created:
+        Appointment.objects.filter(
+            time=instance, appointment_datetime__gte=timezone.now()
+        ).exclude(
+            medic_id=instance.medic_id, clinic_id=instance.clinic_id
+        ).update(medic_id=instance.medic_id, clinic_id=instance.clinic_id)
+
+
+def invalidate_medics_availability(instance):
+    # Both the medic an instance was loaded with and its current one, as
+    # it may have moved from one to the other.
+    medic_ids = {instance.medic_id, getattr(instance, '_loaded_medic_id', None)}
+    for medic_id in medic_ids - {None}:
+        transaction.on_commit(
+            lambda medic_id=medic_id: invalidate_medic_availability(medic_id))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_availability(sender, instance, **kwargs):
+    invalidate_medics_availability(instance)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def invalidate_time_availability(sender, instance, **kwargs):
+    invalidate_medics_availability(instance)
+
+
+# Reminders are rebuilt daily by reschedule_patient_reminders, so a Redis
+# failure here must not fail the request that changed the appointment.
+@receiver(post_save, sender=Appointment)
+def schedule_appointment_reminders(sender, instance, **kwargs):
+    appointment = (instance.id, instance.appointment_datetime)
+    transaction.on_commit(
+        lambda: PatientReminders().schedule([appointment]), robust=True)
+
+
+@receiver(post_delete, sender=Appointment)
+def cancel_appointment_reminders(sender, instance, **kwargs):
+    appointment_id = instance.id
+    transaction.on_commit(
+        lambda: PatientReminders().cancel([appointment_id]), robust=True)
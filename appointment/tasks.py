@@ -1,26 +1,210 @@
+from collections import defaultdict
+from itertools import islice
+
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
-from .models import Appointment
-from .utils import send_sms_to_medic
+
+from appointment_system.routers import replica_reads
+from sms.dispatch import send_bulk_sms
+from user.models import TimeSlot
+
+from .availability import invalidate_medic_availability
+from .booking import next_appointment_date, occurrence_counters
+from .models import Appointment, SlotOccurrence
+from .partitions import archive_partitions, ensure_partitions
+from .reminders import PatientReminders, SentReminders, medic_digests, send_due_reminders
+from .reservations import SlotReservations
+
 
 @shared_task
+@replica_reads()
 def send_appointment_sms():
-    today = timezone.now().date()
-    tomorrow = today + timezone.timedelta(days=1)
+    """
+    Stream tomorrow's appointments grouped by medic and hand their digests
+    to send_medic_reminders, `REMINDER_BATCH_SIZE` medics per task.
+    """
+    tomorrow = timezone.localdate() + timezone.timedelta(days=1)
+
+    batches, batch = 0, []
+    for digest in medic_digests(tomorrow):
+        batch.append(digest)
+        if len(batch) == settings.REMINDER_BATCH_SIZE:
+            send_medic_reminders.delay(tomorrow.isoformat(), batch)
+            batches, batch = batches + 1, []
+
+    if batch:
+        send_medic_reminders.delay(tomorrow.isoformat(), batch)
+        batches += 1
+
+    return batches
+
+
+@shared_task
+def send_medic_reminders(date, digests):
+    """
+    Send each medic the digest of their appointments on `date`, unless an
+    earlier run already did.
+    """
+    reminders = SentReminders()
+    names = reminders.claim([f'medic:{date}:{medic_id}'
+                             for medic_id, phone_number, lines in digests])
+
+    messages = [
+        {'phone_number': phone_number,
+         'text': f'Appointments for {date}:\n' + ''.join(f'{line}\n' for line in lines)}
+        for medic_id, phone_number, lines in digests
+        if f'medic:{date}:{medic_id}' in names
+    ]
+
+    try:
+        send_bulk_sms(messages)
+    except Exception:
+        reminders.release(names)
+        raise
+
+    return len(messages)
+
+
+@shared_task
+def send_patient_reminders():
+    """
+    Send the patient reminders that are due, `PATIENT_REMINDER_BATCH_SIZE`
+    at a time. A batch that cannot be sent is put back for the next tick.
+    """
+    reminders, sent = PatientReminders(), 0
+    while True:
+        due = reminders.pop(settings.PATIENT_REMINDER_BATCH_SIZE)
+        if not due:
+            return sent
+
+        try:
+            sent += send_due_reminders(due)
+        except Exception:
+            reminders.restore(due)
+            raise
+
+        if len(due) < settings.PATIENT_REMINDER_BATCH_SIZE:
+            return sent
+
+
+@shared_task
+def reschedule_patient_reminders():
+    """
+    Schedule again the reminders of the appointments that fall within the
+    longest lead time and a day, restoring any Redis has lost.
+    """
+    now = timezone.now()
+    horizon = max(settings.PATIENT_REMINDER_LEADS) + 24 * 60 * 60
+    appointments = Appointment.objects.filter(
+        appointment_datetime__gt=now,
+        appointment_datetime__lte=now + timezone.timedelta(seconds=horizon),
+    ).values_list('id', 'appointment_datetime').iterator(
+        chunk_size=settings.PATIENT_REMINDER_BATCH_SIZE)
 
-    appointments = Appointment.objects.filter(appointment_datetime__date=tomorrow)
+    reminders, count = PatientReminders(), 0
+    while chunk := list(islice(appointments, settings.PATIENT_REMINDER_BATCH_SIZE)):
+        reminders.schedule(chunk)
+        count += len(chunk)
+    return count
 
-    medic_appointments = {}
-    for appointment in appointments:
-        medic = appointment.time.medic
-        if medic not in medic_appointments:
-            medic_appointments[medic] = []
-        medic_appointments[medic].append(appointment)
 
-    for medic, appointments in medic_appointments.items():
-        message = f"Appointments for {tomorrow}:\n"
-        for appointment in appointments:
-            message += f"- {appointment.patient} at {appointment.appointment_datetime.strftime('%H:%M')}\n"
-        
+@shared_task
+def generate_slot_occurrences(weeks=None, time_ids=None):
+    """
+    Create the missing slot occurrences of every active time slot, or only
+    of `time_ids`, for the next `weeks` weeks, counting the appointments
+    already booked on them.
+    """
+    weeks = weeks or settings.SLOT_OCCURRENCE_WEEKS
+    today = timezone.localdate()
+    last_day = today + timezone.timedelta(weeks=weeks)
+
+    times = TimeSlot.objects.filter(is_active=True)
+    if time_ids is not None:
+        times = times.filter(id__in=time_ids)
+
+    numbers = defaultdict(list)
+    appointments = Appointment.objects.filter(time__in=times).between(
+        today + timezone.timedelta(days=1),
+        last_day + timezone.timedelta(days=1),
+    ).values_list('time_id', 'appointment_datetime', 'appointment_number')
+
+    for time_id, appointment_datetime, number in appointments.iterator():
+        numbers[(time_id, timezone.localdate(appointment_datetime))]\
+            .append(number)
+
+    occurrences = []
+    for time in times.iterator():
+        date = next_appointment_date(time, today)
+        while date <= last_day:
+            occurrences.append(SlotOccurrence(
+                time=time,
+                date=date,
+                capacity=time.avg_patient_visit or 0,
+                **occurrence_counters(numbers[(time.id, date)]),
+            ))
+            date += timezone.timedelta(weeks=1)
+
+    SlotOccurrence.objects.bulk_create(
+        occurrences, batch_size=1000, ignore_conflicts=True)
+
+    return len(occurrences)
+
+
+@shared_task
+def reconcile_slot_reservations():
+    """
+    Rebuild the Redis place counters of the redis booking backend from the
+    appointments table, and bring the slot occurrences in line with them.
+    """
+    if settings.BOOKING_BACKEND != 'redis':
+        return 0
+
+    reservations = SlotReservations()
+    slots = set(reservations.scan())
+    if not slots:
+        return 0
 
-        send_sms_to_medic(medic.phone_number, message)
\ No newline at end of file
+    numbers = defaultdict(list)
+    appointments = Appointment.objects.filter(
+        time_id__in={time_id for time_id, date in slots},
+    ).on_dates(
+        {date for time_id, date in slots}
+    ).values_list('time_id', 'appointment_datetime', 'appointment_number')
+
+    for time_id, appointment_datetime, number in appointments.iterator():
+        numbers[(time_id, timezone.localdate(appointment_datetime))]\
+            .append(number)
+
+    changed = set()
+    for time_id, date in slots:
+        reserved, next_free = reservations.reset(
+            time_id, date, numbers[(time_id, date)])
+        if SlotOccurrence.objects.filter(time_id=time_id, date=date).exclude(
+                reserved=reserved, next_number=next_free).update(
+                reserved=reserved, next_number=next_free):
+            changed.add(time_id)
+
+    # The updates send no signals, so the cached availability is dropped here.
+    for medic_id in set(TimeSlot.objects.filter(id__in=changed)
+                        .values_list('medic_id', flat=True)):
+        invalidate_medic_availability(medic_id)
+
+    return len(slots)
+
+
+@shared_task
+def create_appointment_partitions():
+    """
+    Keep monthly partitions of the appointment table ready ahead of time.
+    """
+    return ensure_partitions()
+
+
+@shared_task
+def archive_appointment_partitions():
+    """
+    Move the partitions of long past months into compressed archives.
+    """
+    return archive_partitions()
@@ -0,0 +1,357 @@
+import threading
+from datetime import time as datetime_time, timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import ValidationError
+
+from appointment.availability import availability_version
+from appointment.booking import book_appointment, move_appointment, next_appointment_date
+from appointment.models import Appointment, SlotOccurrence, day_start
+from appointment.reservations import SlotReservations
+from appointment.tasks import generate_slot_occurrences, reconcile_slot_reservations
+from clinic.models import Clinic
+from user.models import Medic, Patient, TimeSlot, User
+
+
+class BookingMixin:
+    def create_slot(self, capacity):
+        medic_user = User.objects.create_user(
+            phone_number='09120000000', first_name='reza', last_name='molaei', age=53, is_medic=True)
+        medic = Medic.objects.create(
+            user=medic_user, specialization='hand', medical_system_number='245233', accepted=True)
+        clinic = Clinic.objects.create(
+            name='ali', clinic_serial='532', accepted=True)
+        return TimeSlot.objects.create(
+            medic=medic, clinic=clinic, day_of_week=0, start_time=datetime_time(9),
+            end_time=datetime_time(17), avg_visit_time=10, avg_patient_visit=capacity)
+
+    def create_other_slot(self, timeslot, capacity):
+        return TimeSlot.objects.create(
+            medic=timeslot.medic, clinic=timeslot.clinic, day_of_week=1,
+            start_time=datetime_time(14), end_time=datetime_time(17),
+            avg_visit_time=10, avg_patient_visit=capacity)
+
+    def create_patients(self, count):
+        return [
+            Patient.objects.create(user=User.objects.create_user(
+                phone_number=f'0935{index:07}', is_patient=True))
+            for index in range(count)
+        ]
+
+
+class BookAppointmentTest(BookingMixin, TestCase):
+    def setUp(self):
+        self.timeslot = self.create_slot(capacity=3)
+        self.patients = self.create_patients(4)
+
+    def test_numbers_and_times_follow_each_other(self):
+        first = book_appointment(self.timeslot, self.patients[0])
+        second = book_appointment(self.timeslot, self.patients[1])
+
+        self.assertEqual(first.appointment_number, 1)
+        self.assertEqual(second.appointment_number, 2)
+        self.assertEqual(
+            (second.appointment_datetime - first.appointment_datetime).seconds, 600)
+
+    def test_fully_booked(self):
+        for patient in self.patients[:3]:
+            book_appointment(self.timeslot, patient)
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self.timeslot, self.patients[3])
+
+    def test_cancelled_number_is_reused(self):
+        appointments = [book_appointment(self.timeslot, patient)
+                        for patient in self.patients[:3]]
+        appointments[1].delete()
+
+        appointment = book_appointment(self.timeslot, self.patients[3])
+
+        self.assertEqual(appointment.appointment_number, 2)
+        self.assertEqual(appointment.appointment_datetime,
+                         appointments[1].appointment_datetime)
+
+    def test_booking_a_later_week(self):
+        date = next_appointment_date(self.timeslot) + timedelta(weeks=3)
+
+        appointment = book_appointment(
+            self.timeslot, self.patients[0], date=date)
+
+        self.assertEqual(appointment.appointment_datetime.date(), date)
+        self.assertEqual(appointment.appointment_number, 1)
+
+    def test_date_must_match_weekday_and_window(self):
+        date = next_appointment_date(self.timeslot)
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self.timeslot, self.patients[0],
+                             date=date + timedelta(days=1))
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self.timeslot, self.patients[0],
+                             date=date + timedelta(weeks=13))
+
+    def test_occurrence_counters(self):
+        first = book_appointment(self.timeslot, self.patients[0])
+        book_appointment(self.timeslot, self.patients[1])
+
+        occurrence = SlotOccurrence.objects.get(time=self.timeslot)
+        self.assertEqual(occurrence.reserved, 2)
+        self.assertEqual(occurrence.next_number, 3)
+
+        first.delete()
+
+        occurrence.refresh_from_db()
+        self.assertEqual(occurrence.reserved, 1)
+        self.assertEqual(occurrence.next_number, 1)
+        self.assertEqual(occurrence.remaining, 2)
+
+    def test_capacity_follows_time_slot(self):
+        book_appointment(self.timeslot, self.patients[0])
+
+        self.timeslot.avg_patient_visit = 1
+        self.timeslot.save()
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self.timeslot, self.patients[1])
+
+    def test_moving_takes_a_place_of_the_new_slot(self):
+        appointment = book_appointment(self.timeslot, self.patients[0])
+        other = self.create_other_slot(self.timeslot, capacity=1)
+        book_appointment(self.timeslot, self.patients[1])
+
+        moved = move_appointment(appointment, other)
+        date = next_appointment_date(other)
+        self.assertEqual(moved.appointment_number, 1)
+        self.assertEqual(moved.appointment_datetime, day_start(date) + timedelta(hours=14))
+        self.assertEqual(SlotOccurrence.objects.get(time=self.timeslot).reserved, 1)
+        self.assertEqual(SlotOccurrence.objects.get(time=other).reserved, 1)
+
+        with self.assertRaises(ValidationError):
+            move_appointment(book_appointment(self.timeslot, self.patients[2]), other)
+        self.assertEqual(SlotOccurrence.objects.get(time=self.timeslot).reserved, 2)
+
+        Appointment.objects.get(id=moved.id).delete()
+        occurrence = SlotOccurrence.objects.get(time=other)
+        self.assertEqual((occurrence.reserved, occurrence.next_number), (0, 1))
+
+    def test_query_count_does_not_grow(self):
+        book_appointment(self.timeslot, self.patients[0])
+
+        with self.assertNumQueries(13):
+            book_appointment(self.timeslot, self.patients[1])
+
+        with self.assertNumQueries(13):
+            book_appointment(self.timeslot, self.patients[2])
+
+
+class AppointmentMedicClinicTest(BookingMixin, TestCase):
+    def setUp(self):
+        self.timeslot = self.create_slot(capacity=3)
+        self.patient, = self.create_patients(1)
+
+    def test_booking_copies_medic_and_clinic(self):
+        appointment = book_appointment(self.timeslot, self.patient)
+
+        self.assertEqual(appointment.medic_id, self.timeslot.medic_id)
+        self.assertEqual(appointment.clinic_id, self.timeslot.clinic_id)
+
+    def test_backfill(self):
+        backfill = import_module(
+            'appointment.migrations.0017_backfill_appointment_medic_clinic')
+        appointment = book_appointment(self.timeslot, self.patient)
+        Appointment.objects.update(medic=None, clinic=None)
+
+        backfill.backfill_medic_clinic(apps, None)
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.medic_id, self.timeslot.medic_id)
+        self.assertEqual(appointment.clinic_id, self.timeslot.clinic_id)
+
+    def test_upcoming_appointments_follow_clinic_change(self):
+        appointment = book_appointment(self.timeslot, self.patient)
+        clinic = Clinic.objects.create(
+            name='reza', clinic_serial='533', accepted=True)
+
+        self.timeslot.clinic = clinic
+        self.timeslot.save()
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.clinic, clinic)
+
+    def test_upcoming_appointments_follow_medic_change(self):
+        appointment = book_appointment(self.timeslot, self.patient)
+        medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='09130000000', is_medic=True),
+            specialization='eye', medical_system_number='245234', accepted=True)
+
+        self.timeslot.medic = medic
+        self.timeslot.save()
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.medic, medic)
+
+
+@override_settings(TIME_ZONE='Asia/Tehran')
+class AppointmentDateRangeTest(BookingMixin, TestCase):
+    def test_days_follow_the_current_timezone(self):
+        timeslot = self.create_slot(capacity=3)
+        date = next_appointment_date(timeslot)
+        appointment = book_appointment(timeslot, self.create_patients(1)[0])
+
+        def moved_to(hour, days=0):
+            Appointment.objects.update(appointment_datetime=day_start(
+                date + timedelta(days=days)) + timedelta(hours=hour))
+            return list(Appointment.objects.on_date(date))
+
+        self.assertEqual(moved_to(0), [appointment])
+        self.assertEqual(moved_to(23.99), [appointment])
+        self.assertEqual(moved_to(0, days=1), [])
+        self.assertEqual(moved_to(-0.01), [])
+        self.assertEqual(list(Appointment.objects.on_dates([])), [])
+        self.assertEqual(list(Appointment.objects.between(
+            date - timedelta(days=1), date)), [appointment])
+
+
+class GenerateSlotOccurrencesTest(BookingMixin, TestCase):
+    def test_generates_weeks_ahead_with_booked_counts(self):
+        timeslot = self.create_slot(capacity=3)
+        book_appointment(timeslot, self.create_patients(1)[0])
+
+        self.assertEqual(generate_slot_occurrences(weeks=3), 3)
+        generate_slot_occurrences(weeks=3)
+
+        occurrences = SlotOccurrence.objects.filter(
+            time=timeslot).order_by('date')
+        self.assertEqual(occurrences.count(), 3)
+        self.assertEqual(occurrences[0].date, next_appointment_date(timeslot))
+        self.assertEqual(
+            [occurrence.reserved for occurrence in occurrences], [1, 0, 0])
+
+
+class ConcurrentBookingTest(BookingMixin, TransactionTestCase):
+    def assert_never_overbooks(self, capacity=5, attempts=30):
+        timeslot = self.create_slot(capacity=capacity)
+        patients = self.create_patients(attempts)
+        barrier = threading.Barrier(attempts)
+        rejected = []
+
+        def book(patient):
+            try:
+                barrier.wait()
+                book_appointment(timeslot, patient)
+            except ValidationError:
+                rejected.append(patient)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(patient,))
+                   for patient in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        numbers = list(Appointment.objects.filter(
+            time=timeslot).values_list('appointment_number', flat=True))
+        self.assertEqual(sorted(numbers), list(range(1, capacity + 1)))
+        self.assertEqual(len(rejected), attempts - capacity)
+
+        return timeslot
+
+    def test_concurrent_bookings_never_overbook(self):
+        self.assert_never_overbooks()
+
+    @override_settings(BOOKING_BACKEND='redis')
+    def test_concurrent_redis_bookings_never_overbook(self):
+        timeslot = self.assert_never_overbooks()
+
+        reservations = SlotReservations()
+        reservations.client.delete(*reservations.keys(
+            timeslot.id, next_appointment_date(timeslot)))
+
+
+@override_settings(BOOKING_BACKEND='redis')
+class RedisBookingTest(BookingMixin, TestCase):
+    def setUp(self):
+        self.timeslot = self.create_slot(capacity=3)
+        self.patients = self.create_patients(4)
+        self.date = next_appointment_date(self.timeslot)
+        self.reservations = SlotReservations()
+
+    def tearDown(self):
+        self.reservations.client.delete(
+            *self.reservations.keys(self.timeslot.id, self.date))
+
+    def test_numbers_come_from_redis(self):
+        first = book_appointment(self.timeslot, self.patients[0])
+        second = book_appointment(self.timeslot, self.patients[1])
+
+        self.assertEqual(first.appointment_number, 1)
+        self.assertEqual(second.appointment_number, 2)
+        occurrence = SlotOccurrence.objects.get(time=self.timeslot)
+        self.assertEqual(occurrence.reserved, 2)
+        self.assertEqual(occurrence.next_number, 3)
+
+    def test_fully_booked(self):
+        for patient in self.patients[:3]:
+            book_appointment(self.timeslot, patient)
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self.timeslot, self.patients[3])
+
+    def test_cancelled_number_is_reused(self):
+        appointments = [book_appointment(self.timeslot, patient)
+                        for patient in self.patients[:3]]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointments[1].delete()
+
+        appointment = book_appointment(self.timeslot, self.patients[3])
+        self.assertEqual(appointment.appointment_number, 2)
+
+    def test_moving_takes_a_place_from_redis(self):
+        appointment = book_appointment(self.timeslot, self.patients[0])
+        other = self.create_other_slot(self.timeslot, capacity=1)
+        self.addCleanup(self.reservations.client.delete,
+                        *self.reservations.keys(other.id, next_appointment_date(other)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            move_appointment(appointment, other)
+        self.assertEqual(appointment.appointment_number, 1)
+        self.assertEqual(SlotOccurrence.objects.get(time=other).reserved, 1)
+
+        with self.assertRaises(ValidationError):
+            book_appointment(other, self.patients[1])
+        self.assertEqual(
+            book_appointment(self.timeslot, self.patients[1]).appointment_number, 1)
+
+    def test_reconcile_fixes_drift(self):
+        book_appointment(self.timeslot, self.patients[0])
+        self.reservations.reset(self.timeslot.id, self.date, [1, 2, 3])
+
+        with override_settings(BOOKING_RESERVATION_GRACE=0):
+            self.assertEqual(reconcile_slot_reservations(), 1)
+
+        appointment = book_appointment(self.timeslot, self.patients[1])
+        self.assertEqual(appointment.appointment_number, 2)
+
+    def test_reconcile_invalidates_availability(self):
+        book_appointment(self.timeslot, self.patients[0])
+        SlotOccurrence.objects.update(reserved=3, next_number=4)
+        version = availability_version(self.timeslot.medic_id)
+
+        with override_settings(BOOKING_RESERVATION_GRACE=0):
+            reconcile_slot_reservations()
+
+        self.assertEqual(SlotOccurrence.objects.get().reserved, 1)
+        self.assertNotEqual(availability_version(self.timeslot.medic_id), version)
+
+    def test_query_count_does_not_grow(self):
+        book_appointment(self.timeslot, self.patients[0])
+
+        with self.assertNumQueries(12):
+            book_appointment(self.timeslot, self.patients[1])
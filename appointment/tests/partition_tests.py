@@ -0,0 +1,98 @@
+from unittest import skipUnless
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from appointment.booking import book_appointment
+from appointment.models import Appointment, AppointmentArchive, AppointmentKey, day_start
+from appointment.partitions import add_months, archive_partitions, create_partition, ensure_partitions, partition_name
+
+from .booking_tests import BookingMixin
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs Postgres.')
+class AppointmentPartitionTest(BookingMixin, TestCase):
+    def setUp(self):
+        self.timeslot = self.create_slot(capacity=3)
+        self.appointment = book_appointment(
+            self.timeslot, self.create_patients(1)[0])
+        self.this_month = timezone.localdate().replace(day=1)
+
+    def move_to(self, month):
+        Appointment.objects.filter(id=self.appointment.id).update(
+            appointment_datetime=day_start(month) + timezone.timedelta(hours=9))
+
+    def partition_of(self, appointment):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tableoid::regclass::text FROM appointment_appointment '
+                'WHERE id = %s', [appointment.id])
+            return cursor.fetchone()[0]
+
+    def test_bookings_land_in_their_month(self):
+        month = timezone.localdate(
+            self.appointment.appointment_datetime).replace(day=1)
+        self.assertEqual(self.partition_of(self.appointment),
+                         partition_name(month))
+
+    def test_ensure_partitions_takes_rows_from_default(self):
+        month = add_months(self.this_month, 8)
+        self.move_to(month)
+        self.assertEqual(self.partition_of(self.appointment),
+                         'appointment_appointment_default')
+
+        created = ensure_partitions(months_ahead=8)
+
+        self.assertIn(partition_name(month), created)
+        self.assertEqual(self.partition_of(self.appointment),
+                         partition_name(month))
+        self.assertEqual(ensure_partitions(months_ahead=8), [])
+        self.assertTrue(AppointmentKey.objects.filter(
+            appointment_id=self.appointment.id).exists())
+
+    def test_prescription_stays_unique(self):
+        duplicate = Appointment(
+            patient=self.appointment.patient, time=self.timeslot,
+            prescription_id=self.appointment.prescription_id,
+            appointment_datetime=day_start(add_months(self.this_month, 1)),
+            appointment_number=2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+
+    def test_moving_keeps_keys(self):
+        self.move_to(add_months(self.this_month, 1))
+        self.assertEqual(
+            AppointmentKey.objects.get(appointment_id=self.appointment.id).prescription_id,
+            self.appointment.prescription_id)
+
+    @override_settings(APPOINTMENT_ARCHIVE_CHUNK_SIZE=64)
+    def test_archive_old_partitions(self):
+        month = add_months(self.this_month, -24)
+        self.move_to(month)
+        with connection.cursor() as cursor:
+            create_partition(cursor, month)
+
+        archived = archive_partitions(keep_months=12)
+
+        self.assertEqual(archived, [partition_name(month)])
+        self.assertFalse(
+            Appointment.objects.filter(id=self.appointment.id).exists())
+        self.assertFalse(AppointmentKey.objects.filter(
+            appointment_id=self.appointment.id).exists())
+
+        archive = AppointmentArchive.objects.get(month=month)
+        self.assertEqual(archive.appointment_count, 1)
+        self.assertGreater(archive.chunks.count(), 1)
+        row, = archive.rows()
+        self.assertEqual(row['id'], self.appointment.id)
+        self.assertEqual(row['patient_id'], self.appointment.patient_id)
+
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            AppointmentArchive.objects.filter(id=archive.id).update(
+                appointment_count=0)
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            archive.chunks.all().delete()
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            AppointmentArchive.objects.filter(id=archive.id).delete()
@@ -0,0 +1,170 @@
+import json
+from datetime import time as datetime_time, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointment.booking import book_appointment, next_appointment_date, reserved_numbers
+from appointment.models import Appointment
+from clinic.models import Clinic
+from medical_records.models import MedicalRecord
+from user.models import Medic, Patient, TimeSlot
+
+User = get_user_model()
+
+
+def seq_scans(plan):
+    """
+    Return the tables read with a sequential scan in an EXPLAIN plan.
+    """
+    tables = []
+    if plan['Node Type'] == 'Seq Scan':
+        tables.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        tables += seq_scans(child)
+    return tables
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are read from Postgres.')
+class QueryPlanTest(APITestCase):
+    """
+    EXPLAIN the queries of the hot paths with sequential scans disabled.
+    A query still planned with one has no index it can use.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            phone_number='09123456388', password='34')
+        clinic = Clinic.objects.create(
+            name='ali', clinic_serial='532', accepted=True)
+
+        cls.medics, cls.times = [], []
+        for index in range(3):
+            medic = Medic.objects.create(
+                user=User.objects.create_user(
+                    phone_number=f'0912{index:07}', is_medic=True,
+                    first_name='reza', last_name='molaei', age=53),
+                specialization='hand', medical_system_number=f'24523{index}',
+                accepted=True)
+            cls.medics.append(medic)
+            cls.times.append(TimeSlot.objects.create(
+                medic=medic, clinic=clinic, day_of_week=index,
+                start_time=datetime_time(9), end_time=datetime_time(17),
+                avg_visit_time=10, avg_patient_visit=20))
+
+        cls.patients = []
+        for index in range(10):
+            patient = Patient.objects.create(user=User.objects.create_user(
+                phone_number=f'0935{index:07}', is_patient=True,
+                first_name='karim', last_name='shivaey', age=26))
+            cls.patients.append(patient)
+            for time in cls.times:
+                book_appointment(time, patient)
+
+        cls.appointment = Appointment.objects.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan, = cursor.fetchone()
+            finally:
+                cursor.execute('RESET enable_seqscan')
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertIndexed(self, queries):
+        selects = [query['sql'] for query in queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+
+        for sql in selects:
+            self.assertEqual(seq_scans(self.explain(sql)), [], sql)
+
+    def assertRequestIndexed(self, url, user=None, params=None):
+        if user is not None:
+            user = User.objects.get(id=user.id)
+        self.client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIndexed(queries)
+
+    def test_appointment_list(self):
+        url = reverse('appointment-list')
+        self.assertRequestIndexed(url, self.admin_user)
+        self.assertRequestIndexed(url, self.medics[0].user)
+        self.assertRequestIndexed(url, self.patients[0].user)
+
+    def test_appointment_detail(self):
+        self.assertRequestIndexed(
+            reverse('appointment-detail', kwargs={'pk': self.appointment.id}),
+            self.admin_user)
+
+    def test_my_appointment(self):
+        url = reverse('appointment-my-appointment')
+        self.assertRequestIndexed(url, self.medics[0].user)
+        self.assertRequestIndexed(url, self.patients[0].user)
+
+    def test_prescription_list(self):
+        url = reverse('prescription-list')
+        self.assertRequestIndexed(url, self.medics[0].user)
+        self.assertRequestIndexed(url, self.patients[0].user)
+
+    def test_medical_record_list(self):
+        url = reverse('medical_record-list')
+        self.assertRequestIndexed(url, self.medics[0].user)
+        self.assertRequestIndexed(url, self.patients[0].user)
+
+    def test_user_lists(self):
+        self.assertRequestIndexed(reverse('user-list'), self.admin_user)
+        self.assertRequestIndexed(reverse('patient-list'), self.admin_user)
+        self.assertRequestIndexed(reverse('medic-list'))
+        self.assertRequestIndexed(reverse('clinic-list'))
+        self.assertRequestIndexed(
+            reverse('availabe_times-list'), self.medics[0].user)
+
+    def test_availability(self):
+        medic = self.medics[0]
+        self.assertRequestIndexed(
+            reverse('medic-appointment-times', kwargs={'pk': medic.id}))
+        self.assertRequestIndexed(
+            reverse('medic-availability', kwargs={'pk': medic.id}))
+        self.assertRequestIndexed(
+            reverse('medic-earliest'), params={'specialization': 'HAND'})
+
+    def test_reserved_numbers(self):
+        time = self.times[0]
+        with CaptureQueriesContext(connection) as queries:
+            reserved_numbers(time, next_appointment_date(time))
+        self.assertIndexed(queries)
+
+    def test_medical_record_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            MedicalRecord.objects.filter(
+                medic=self.medics[0], patient=self.patients[0]).first()
+        self.assertIndexed(queries)
+
+    def test_date_ranges(self):
+        date = next_appointment_date(self.times[0])
+        with CaptureQueriesContext(connection) as queries:
+            list(Appointment.objects.on_date(date))
+            list(Appointment.objects.on_dates({date, date + timedelta(days=1)}))
+            list(Appointment.objects.filter(time__in=self.times).between(
+                date, date + timedelta(weeks=1)))
+        self.assertIndexed(queries)
@@ -0,0 +1,169 @@
+from datetime import time as datetime_time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from appointment.booking import book_appointment
+from appointment.reminders import PatientReminders, SentReminders
+from appointment.tasks import reschedule_patient_reminders, send_appointment_sms, send_patient_reminders
+from appointment.tests.booking_tests import BookingMixin
+from appointment_system.celery import app
+from sms.providers import FakeProvider
+from user.models import Medic, TimeSlot, User
+
+
+@override_settings(SMS_PROVIDER='sms.providers.FakeProvider')
+class MedicRemindersTest(BookingMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeProvider.outbox.clear()
+        FakeProvider.failures = 0
+
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+        self.tomorrow = timezone.localdate() + timezone.timedelta(days=1)
+        first = self.create_slot(capacity=5)
+        second = TimeSlot.objects.create(
+            medic=Medic.objects.create(
+                user=User.objects.create_user(phone_number='09130000000', is_medic=True),
+                specialization='eye', medical_system_number='245234', accepted=True),
+            clinic=first.clinic, day_of_week=0, start_time=datetime_time(10),
+            end_time=datetime_time(12), avg_visit_time=30, avg_patient_visit=5)
+
+        patients = self.create_patients(3)
+        for timeslot, patient in [(first, patients[0]), (first, patients[1]), (second, patients[2])]:
+            timeslot.day_of_week = self.tomorrow.weekday()
+            timeslot.save()
+            book_appointment(timeslot, patient, date=self.tomorrow)
+
+    def test_one_digest_per_medic(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(send_appointment_sms(), 1)
+
+        self.assertEqual(FakeProvider.outbox, [
+            {'phone_number': '09120000000',
+             'text': f'Appointments for {self.tomorrow}:\n'
+                     '- patient 09350000000 at 09:00\n'
+                     '- patient 09350000001 at 09:10\n'},
+            {'phone_number': '09130000000',
+             'text': f'Appointments for {self.tomorrow}:\n'
+                     '- patient 09350000002 at 10:00\n'},
+        ])
+
+    @override_settings(REMINDER_BATCH_SIZE=1, REMINDER_CHUNK_SIZE=1)
+    def test_fans_out_in_batches(self):
+        self.assertEqual(send_appointment_sms(), 2)
+        self.assertEqual(len(FakeProvider.outbox), 2)
+
+    def test_reruns_send_nothing_twice(self):
+        send_appointment_sms()
+        send_appointment_sms()
+        self.assertEqual(len(FakeProvider.outbox), 2)
+
+    def test_released_reminders_are_sent_again(self):
+        reminders = SentReminders()
+        self.assertEqual(reminders.claim(['a', 'b']), ['a', 'b'])
+        self.assertEqual(reminders.claim(['a', 'c']), ['c'])
+
+        reminders.release(['a'])
+        self.assertEqual(reminders.claim(['a', 'b']), ['a'])
+
+
+@override_settings(SMS_PROVIDER='sms.providers.FakeProvider')
+class PatientRemindersTest(BookingMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeProvider.outbox.clear()
+        FakeProvider.failures = 0
+
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+        self.reminders = PatientReminders()
+        timeslot = self.create_slot(capacity=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment = book_appointment(timeslot, self.create_patients(1)[0])
+        self.reschedule(timezone.now() + timezone.timedelta(days=1, hours=1))
+
+    def reschedule(self, appointment_datetime):
+        self.appointment.appointment_datetime = appointment_datetime.replace(microsecond=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.save()
+
+    def scheduled(self):
+        return {member.decode(): score for member, score in
+                self.reminders.client.zrange(self.reminders.due_key, 0, -1, withscores=True)}
+
+    def make_due(self):
+        self.reminders.client.zadd(self.reminders.due_key, {
+            member: 0 for member in self.reminders.members(self.appointment.id)})
+
+    def test_each_lead_time_is_scheduled(self):
+        at = self.appointment.appointment_datetime.timestamp()
+        self.assertEqual(self.scheduled(), {
+            f'{self.appointment.id}:86400': at - 86400,
+            f'{self.appointment.id}:7200': at - 7200,
+        })
+
+    def test_rescheduling_moves_reminders(self):
+        self.reschedule(timezone.now() + timezone.timedelta(hours=3))
+        self.assertEqual(self.scheduled(), {
+            f'{self.appointment.id}:7200': self.appointment.appointment_datetime.timestamp() - 7200,
+        })
+
+    def test_due_reminders_wait_for_the_tick(self):
+        expected = self.scheduled()
+        at = self.appointment.appointment_datetime
+        self.reminders.schedule([(self.appointment.id, at)], now=at.timestamp())
+        self.assertEqual(self.scheduled(), expected)
+
+    def test_restored_reminders_keep_their_time(self):
+        expected = self.scheduled()
+        at = self.appointment.appointment_datetime.timestamp()
+        due = self.reminders.pop(10, now=at)
+        self.assertEqual(len(due), 2)
+
+        self.reminders.restore(due)
+        self.assertEqual(self.scheduled(), expected)
+
+    def test_deleting_cancels_reminders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.delete()
+        self.assertEqual(self.scheduled(), {})
+
+    def test_due_reminders_are_sent_once(self):
+        self.make_due()
+        self.assertEqual(send_patient_reminders(), 2)
+        self.assertEqual(self.scheduled(), {})
+
+        at = timezone.localtime(self.appointment.appointment_datetime)
+        self.assertEqual(FakeProvider.outbox, 2 * [{
+            'phone_number': '09350000000',
+            'text': f'Reminder: your appointment with reza molaei is on '
+                    f'{at:%Y-%m-%d} at {at:%H:%M}.'}])
+
+    def test_reminders_are_not_sent_twice(self):
+        self.make_due()
+        send_patient_reminders()
+        self.make_due()
+        self.assertEqual(send_patient_reminders(), 0)
+
+    def test_stale_reminders_are_dropped(self):
+        self.reminders.client.zadd(self.reminders.due_key, {'999999:7200': 0})
+        self.assertEqual(send_patient_reminders(), 0)
+        self.assertEqual(FakeProvider.outbox, [])
+
+    @override_settings(PATIENT_REMINDER_BATCH_SIZE=1)
+    def test_pops_in_batches(self):
+        self.make_due()
+        self.assertEqual(send_patient_reminders(), 2)
+        self.assertEqual(len(FakeProvider.outbox), 2)
+
+    def test_reschedule_restores_lost_reminders(self):
+        expected = self.scheduled()
+        self.reminders.client.delete(self.reminders.due_key)
+
+        self.assertEqual(reschedule_patient_reminders(), 1)
+        self.assertEqual(self.scheduled(), expected)
@@ -0,0 +1,37 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from appointment.management.commands.benchmark_serializers import build_appointments
+from appointment.serializers import AppointmentSerializer, CompiledAppointmentSerializer, CompiledRetrieveAppointmentSerializer, RetrieveAppointmentSerializer
+from medical_records.serializers import CompiledGETMedicalRecordSerializer, GETMedicalRecordSerializer
+
+
+class CompiledReadSerializerTest(TestCase):
+    def setUp(self):
+        self.appointments = build_appointments(3)
+        self.appointments[1].prescription = None
+        self.appointments[2].time.medic.image = 'media/medic/1.png'
+        self.context = {'request': APIRequestFactory().get('/')}
+
+    def assertSameOutput(self, template, compiled, instances):
+        self.assertEqual(
+            json.dumps(template(instances, many=True, context=self.context).data),
+            json.dumps(compiled(instances, many=True, context=self.context).data))
+
+    def test_retrieve_appointment(self):
+        self.assertSameOutput(RetrieveAppointmentSerializer,
+                              CompiledRetrieveAppointmentSerializer,
+                              self.appointments)
+
+    def test_appointment(self):
+        self.assertSameOutput(AppointmentSerializer,
+                              CompiledAppointmentSerializer,
+                              self.appointments)
+
+    def test_medical_record(self):
+        self.assertSameOutput(GETMedicalRecordSerializer,
+                              CompiledGETMedicalRecordSerializer,
+                              [appointment.medical_record
+                               for appointment in self.appointments])
@@ -0,0 +1,341 @@
+import json
+import threading
+from datetime import time as datetime_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from appointment.booking import book_appointment, next_appointment_date
+from appointment.models import Appointment, day_start
+from appointment_system.routers import reading_from_replica, replica_reads
+from clinic.models import Clinic
+from user.authentication import RoleRefreshToken
+from user.models import Medic, Patient, TimeSlot
+
+User = get_user_model()
+
+
+class AppointmentMixin:
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_superuser(
+            phone_number='09123456388', password='34')
+        self.medic_user = User.objects.create_user(
+            phone_number='0987654321', is_medic=True, first_name='reza', last_name='molaei', age=53)
+        self.medic = Medic.objects.create(
+            user=self.medic_user, specialization='hand', medical_system_number='245233', accepted=True)
+        self.clinic = Clinic.objects.create(
+            name='ali', clinic_serial='532', accepted=True)
+        self.timeslot = TimeSlot.objects.create(
+            medic=self.medic, clinic=self.clinic, day_of_week=0, start_time=datetime_time(9),
+            end_time=datetime_time(17), avg_visit_time=10, avg_patient_visit=20)
+        self.patient_count = 0
+        self.appointment = self.book()
+
+    def book(self):
+        self.patient_count += 1
+        patient = Patient.objects.create(user=User.objects.create_user(
+            phone_number=f'0935{self.patient_count:07}', is_patient=True,
+            first_name='karim', last_name='shivaey', age=26))
+        return book_appointment(self.timeslot, patient)
+
+
+class AppointmentViewSetQueryTest(AppointmentMixin, APITestCase):
+    def assertConstantQueries(self, url, user, rows=5):
+        self.client.force_authenticate(user=User.objects.get(id=user.id))
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for _ in range(rows):
+            self.book()
+
+        self.client.force_authenticate(user=User.objects.get(id=user.id))
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertEqual(len(first), len(second))
+
+        return response
+
+    def test_list_as_admin(self):
+        response = self.assertConstantQueries(
+            reverse('appointment-list'), self.admin_user)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_list_as_medic(self):
+        response = self.assertConstantQueries(
+            reverse('appointment-list'), self.medic_user)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_my_appointment_as_medic(self):
+        response = self.assertConstantQueries(
+            reverse('appointment-my-appointment'), self.medic_user)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_retrieve(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('appointment-detail', kwargs={'pk': self.appointment.id})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['medical_record']['medic']['user']['first_name'], 'reza')
+
+    def test_claims_users_are_filtered_without_profile_queries(self):
+        for user in [self.medic_user, self.appointment.patient.user]:
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'JWT {RoleRefreshToken.for_user(user).access_token}')
+            for url in [reverse('appointment-list'), reverse('appointment-my-appointment')]:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(len(response.data['results']), 1)
+
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('FROM "user_medic"', sql)
+                self.assertNotIn('FROM "user_patient"', sql)
+
+    def test_prescription_list_as_medic(self):
+        response = self.assertConstantQueries(
+            reverse('prescription-list'), self.medic_user)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_list_pages_by_cursor(self):
+        for _ in range(4):
+            self.book()
+        self.client.force_authenticate(user=self.admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('appointment-list'), {'page_size': 3})
+        self.assertNotIn('COUNT(', ' '.join(q['sql'] for q in queries))
+        self.assertNotIn('count', response.data)
+
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+
+        self.assertEqual(seen, list(Appointment.objects.order_by(
+            'appointment_datetime', 'id').values_list('id', flat=True)))
+
+
+class UpdateAppointmentTest(AppointmentMixin, APITestCase):
+    def test_changing_time_moves_medic_and_clinic(self):
+        medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='09130000000', is_medic=True),
+            specialization='eye', medical_system_number='245234', accepted=True)
+        clinic = Clinic.objects.create(
+            name='reza', clinic_serial='533', accepted=True)
+        timeslot = TimeSlot.objects.create(
+            medic=medic, clinic=clinic, day_of_week=1, start_time=datetime_time(14),
+            end_time=datetime_time(17), avg_visit_time=10, avg_patient_visit=20)
+        self.book()
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.put(
+            reverse('appointment-detail', kwargs={'pk': self.appointment.id}),
+            {'time': timeslot.id, 'appointment_number': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        appointment = Appointment.objects.select_related('medical_record').get(
+            id=self.appointment.id)
+        self.assertEqual(appointment.medic_id, medic.id)
+        self.assertEqual(appointment.clinic_id, clinic.id)
+        self.assertEqual(appointment.appointment_number, 1)
+        self.assertEqual(appointment.appointment_datetime, day_start(
+            next_appointment_date(timeslot)) + timedelta(hours=14))
+        self.assertEqual(appointment.medical_record.medic_id, medic.id)
+        self.assertEqual(appointment.medical_record.patient_id, appointment.patient_id)
+
+
+    def test_moving_to_a_full_slot_is_rejected(self):
+        timeslot = TimeSlot.objects.create(
+            medic=self.medic, clinic=self.clinic, day_of_week=1, start_time=datetime_time(9),
+            end_time=datetime_time(17), avg_visit_time=10, avg_patient_visit=0)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.put(
+            reverse('appointment-detail', kwargs={'pk': self.appointment.id}),
+            {'time': timeslot.id, 'appointment_number': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        appointment = Appointment.objects.get(id=self.appointment.id)
+        self.assertEqual(appointment.time_id, self.timeslot.id)
+        self.assertEqual(appointment.appointment_number, 1)
+
+
+class SparseFieldsTest(AppointmentMixin, APITestCase):
+    def get(self, url, params):
+        self.client.force_authenticate(
+            user=User.objects.get(id=self.medic_user.id))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries[-1]['sql']
+
+    def test_fields_skip_joins_and_columns(self):
+        response, sql = self.get(reverse('appointment-my-appointment'), {
+            'fields': 'id,appointment_datetime,appointment_number'})
+
+        row, = response.data['results']
+        self.assertEqual(set(row),
+                         {'id', 'appointment_datetime', 'appointment_number'})
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('short_description', sql)
+
+    def test_nested_fields(self):
+        response, sql = self.get(reverse('appointment-my-appointment'), {
+            'fields': 'id,medical_record.medic.user.first_name'})
+
+        row, = response.data['results']
+        self.assertEqual(row, {
+            'id': self.appointment.id,
+            'medical_record': {'medic': {'user': {'first_name': 'reza'}}},
+        })
+        self.assertNotIn('"user_patient"', sql)
+        self.assertNotIn('prescription', sql)
+
+    def test_exclude(self):
+        response, sql = self.get(reverse('appointment-list'), {
+            'exclude': 'patient.user,short_description'})
+
+        row, = response.data['results']
+        self.assertNotIn('short_description', row)
+        self.assertNotIn('user', row['patient'])
+        self.assertIn('address', row['patient'])
+        self.assertNotIn('"user_user"', sql)
+
+
+class StreamingListTest(AppointmentMixin, APITestCase):
+    def test_stream_as_admin(self):
+        for _ in range(4):
+            self.book()
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.get(reverse('appointment-list'), {
+            'stream': 'true', 'fields': 'id,appointment_number'})
+        self.assertTrue(response.streaming)
+
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, [
+            {'id': appointment.id,
+             'appointment_number': appointment.appointment_number}
+            for appointment in Appointment.objects.order_by(
+                'appointment_datetime', 'id')])
+
+    def test_stream_as_medic(self):
+        self.client.force_authenticate(user=self.medic_user)
+        response = self.client.get(
+            reverse('appointment-list'), {'stream': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(AppointmentMixin, APITestCase):
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # Let the test database be dropped.
+        connections['replica1'].close_pool()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def get_queries(self, url):
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(primary), len(replica)
+
+    def test_safe_requests_read_from_replica(self):
+        primary, replica = self.get_queries(reverse('appointment-list'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.client.delete(
+            reverse('appointment-detail', kwargs={'pk': self.appointment.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        primary, replica = self.get_queries(reverse('appointment-list'))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_user_stays_pinned_across_tokens(self):
+        self.client.force_authenticate(user=None)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {RoleRefreshToken.for_user(self.admin_user).access_token}')
+        response = self.client.delete(
+            reverse('appointment-detail', kwargs={'pk': self.appointment.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {RoleRefreshToken.for_user(self.admin_user).access_token}')
+        primary, replica = self.get_queries(reverse('appointment-list'))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        other_user = User.objects.create_user(phone_number='09100000000')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {RoleRefreshToken.for_user(other_user).access_token}')
+        primary, replica = self.get_queries(reverse('appointment-list'))
+        self.assertEqual(primary, 0)
+
+    def test_replica_reads_keep_writes_on_primary(self):
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica, \
+                replica_reads():
+            Appointment.objects.exists()
+            Clinic.objects.create(name='reza', clinic_serial='533')
+        self.assertEqual(len(replica), 1)
+        self.assertEqual(len(primary), 1)
+
+    def test_replica_reads_decorator_nests_and_runs_concurrently(self):
+        barrier, errors = threading.Barrier(2), []
+
+        @replica_reads()
+        def read(depth):
+            if depth:
+                read(depth - 1)
+                self.assertTrue(reading_from_replica.get())
+            else:
+                barrier.wait(5)
+
+        def run():
+            try:
+                read(1)
+                self.assertFalse(reading_from_replica.get())
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_database_metrics(self):
+        self.get_queries(reverse('appointment-list'))
+        response = self.client.get(reverse('database-metrics'))
+        self.assertGreater(response.data['queries']['replica1'], 0)
+
+        pool = response.data['pools']['default']
+        self.assertEqual(pool['pool_max'], settings.DATABASE_POOL['max_size'])
+        self.assertGreaterEqual(pool['in_use'], 1)
+        self.assertLessEqual(pool['saturation'], 1)
+
+        self.client.force_authenticate(user=self.medic_user)
+        response = self.client.get(reverse('database-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,2 +0,0 @@
-def send_sms_to_medic(phone_number):
-    print('sms sent')
\ No newline at end of file
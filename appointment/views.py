@@ -1,41 +1,61 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.db.models import Q
+from django.utils import timezone
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.views import Response, status
 from rest_framework.decorators import action
 
 from .models import Appointment, Prescription
-from .serializers import AppointmentSerializer, PrescriptionSerializer, RetrieveAppointmentSerializer, UpdateAppointmentSerializer
+from .serializers import AppointmentSerializer, CompiledAppointmentSerializer, CompiledRetrieveAppointmentSerializer, PrescriptionSerializer, RetrieveAppointmentSerializer, UpdateAppointmentSerializer
 
+from appointment_system.sparse import SparseFieldsViewMixin
+from appointment_system.streaming import StreamingListMixin
+from user.authentication import user_roles
 from user.permissions import IsMedicOrAdmin, IsPatientOrAdmin, IsAppointmentRelated
 
 
-class AppointmentViewSet(ModelViewSet):
+class AppointmentViewSet(StreamingListMixin, SparseFieldsViewMixin, ModelViewSet):
     serializer_class = AppointmentSerializer
+    cursor_ordering = ('appointment_datetime', 'id')
 
     def get_serializer_class(self):
         if self.action == 'update':
             return UpdateAppointmentSerializer
 
-        elif self.action == 'retrieve':
+        elif self.action in ['retrieve', 'my_appointment']:
+            if self.request.method == 'GET':
+                return CompiledRetrieveAppointmentSerializer
             return RetrieveAppointmentSerializer
 
+        elif self.action == 'list' and self.request.method == 'GET':
+            return CompiledAppointmentSerializer
+
         return AppointmentSerializer
 
+    def get_base_queryset(self):
+        if self.action in ['retrieve', 'my_appointment']:
+            return Appointment.objects.select_related(
+                'prescription',
+                'medical_record__medic__user',
+                'medical_record__patient__user')
+
+        return Appointment.objects.select_related('patient__user')
+
     def get_queryset(self):
         user = self.request.user
+        appointments = self.get_base_queryset()
 
         if user.is_staff or user.is_superuser:
-            return Appointment.objects.all()
+            return appointments
 
-        if user.is_medic:
-            return Appointment.objects.filter(time__medic=user.medic)
+        roles = user_roles(user)
+        if user.is_medic and roles['medic_id'] is not None:
+            return appointments.filter(medic_id=roles['medic_id'])
 
-        elif user.is_patient:
-            return Appointment.objects.filter(patient=user.patient)
+        elif user.is_patient and roles['patient_id'] is not None:
+            return appointments.filter(patient_id=roles['patient_id'])
 
-        return Appointment.objects.none()
+        return appointments.none()
 
     def get_permissions(self):
         if self.action == 'create':
@@ -51,28 +71,30 @@ class AppointmentViewSet(ModelViewSet):
         user = self.request.user
 
         appointments = Appointment.objects.none()
-        now = datetime.now()
+        now = timezone.now()
+        roles = user_roles(user)
 
-        if user.is_medic:
-            appointments = Appointment.objects.filter(
-                Q(time__medic=user.medic) &
+        if user.is_medic and roles['medic_id'] is not None:
+            appointments = self.get_base_queryset().filter(
+                Q(medic_id=roles['medic_id']) &
                 Q(appointment_datetime__gt=now) &
                 Q(appointment_datetime__lt=now+timedelta(days=7)))\
                 .order_by('appointment_datetime')
 
-        elif user.is_patient:
-            appointments = Appointment.objects.filter(
-                Q(patient=user.patient) &
+        elif user.is_patient and roles['patient_id'] is not None:
+            appointments = self.get_base_queryset().filter(
+                Q(patient_id=roles['patient_id']) &
                 Q(appointment_datetime__gt=now) &
                 Q(appointment_datetime__lt=now+timedelta(days=7)))\
                 .order_by('appointment_datetime')
 
-        serializer = RetrieveAppointmentSerializer(appointments, many=True)
+        page = self.paginate_queryset(self.filter_queryset(appointments))
+        serializer = self.get_serializer(page, many=True)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(serializer.data)
 
 
-class PrescriptionViewSet(ModelViewSet):
+class PrescriptionViewSet(SparseFieldsViewMixin, ModelViewSet):
     serializer_class = PrescriptionSerializer
 
     def get_queryset(self):
@@ -84,10 +106,10 @@ class PrescriptionViewSet(ModelViewSet):
         medic = getattr(user, 'medic', None)
 
         if medic and user.is_medic:
-            return Prescription.objects.filter(appointment__time__medic=medic)
+            return Prescription.objects.filter(prescription__medic=medic)
 
         if patient and user.is_patient:
-            return Prescription.objects.filter(appointment__patient=patient)
+            return Prescription.objects.filter(prescription__patient=patient)
 
         return Prescription.objects.none()
 
@@ -3,6 +3,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appointment_system.settings')
 
@@ -10,4 +11,17 @@ app = Celery('appointment_system')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def drop_inherited_pools(**kwargs):
+    """
+    Forked workers open their own connection pools instead of sharing the
+    sockets of the parent's.
+    """
+    from django.db import connections
+
+    for connection in connections.all():
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
@@ -0,0 +1,17 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the view's `cursor_ordering`.
+
+    Pages are fetched with a range condition on an indexed ordering, so
+    neither a COUNT(*) nor a deep OFFSET scan is ever run.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
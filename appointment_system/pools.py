@@ -0,0 +1,25 @@
+from django.db import connections
+
+
+def pool_metrics():
+    """
+    Return the connection pool statistics of this process per database
+    alias, with the mean checkout wait and the share of the pool in use.
+    """
+    metrics = {}
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            continue
+
+        stats = pool.get_stats()
+        requests = stats.get('requests_num', 0)
+        in_use = stats['pool_size'] - stats['pool_available']
+        metrics[connection.alias] = {
+            **stats,
+            'in_use': in_use,
+            'checkout_wait_ms': stats.get('requests_wait_ms', 0) / requests
+            if requests else 0,
+            'saturation': in_use / stats['pool_max'],
+        }
+    return metrics
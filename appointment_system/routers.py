@@ -0,0 +1,129 @@
+import random
+from collections import Counter
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+# Queries run by this process, per database alias.
+query_counts = Counter()
+
+
+def count_queries(execute, sql, params, many, context):
+    query_counts[context['connection'].alias] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender=None, connection=None, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter)
+for opened in connections.all(initialized_only=True):
+    install_query_counter(connection=opened)
+
+
+class replica_reads(ContextDecorator):
+    """
+    Read from the replicas inside the block, or the decorated function.
+    Writes still go to the primary.
+    """
+
+    def _recreate_cm(self):
+        # Each call of a decorated function keeps its own token.
+        return type(self)()
+
+    def __enter__(self):
+        self.token = reading_from_replica.set(True)
+
+    def __exit__(self, *exc_info):
+        reading_from_replica.reset(self.token)
+
+
+class ReplicaRouter:
+    """
+    Send the reads made under `replica_reads` to one of
+    `DATABASE_REPLICAS`, and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def token_user_id(request):
+    """
+    Return the user id of the valid token `request` carries, if any.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = header and authentication.get_raw_token(header)
+        if not raw_token:
+            return None
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def pin_key(request):
+    # Users are pinned across their tokens and devices, anonymous clients
+    # by their session or address.
+    user_id = token_user_id(request)
+    if user_id is not None:
+        return f'db:primary:user:{user_id}'
+
+    client = request.COOKIES.get(settings.SESSION_COOKIE_NAME) \
+        or request.META.get('REMOTE_ADDR', '')
+    return 'db:primary:' + sha256(client.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve safe requests from the replicas. A client that has just written
+    keeps reading from the primary for `REPLICA_STICKY_SECONDS`, so it sees
+    its own writes before they reach the replicas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = pin_key(request)
+
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if response.status_code < 400:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+            return response
+
+        if cache.get(key):
+            return self.get_response(request)
+
+        with replica_reads():
+            return self.get_response(request)
@@ -50,11 +50,14 @@ INSTALLED_APPS = [
     'user',
     'appointment',
     'medical_records',
-    'clinic'
+    'clinic',
+    'sms',
+    'outbox',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'appointment_system.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,6 +98,40 @@ DATABASES = {
     }
 }
 
+# Every web and Celery process keeps a pool of connections per database.
+# A connection is checked before it is handed out, and a request waits at
+# most `timeout` seconds for one when the whole pool is in use.
+DATABASE_POOL = {
+    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+    'timeout': 10,
+}
+DATABASES['default'].update({
+    'OPTIONS': {'pool': DATABASE_POOL},
+    'CONN_HEALTH_CHECKS': True,
+})
+
+# Read replicas of the default database, one per host of the comma
+# separated DATABASE_REPLICA_HOSTS. Without any, a single alias reads from
+# the primary itself but nothing is routed to it.
+DATABASE_REPLICA_HOSTS = [
+    host.strip() for host in os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+for index, host in enumerate(DATABASE_REPLICA_HOSTS or [None], 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        **({'HOST': host} if host else {}),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [f'replica{index}'
+                     for index in range(1, len(DATABASE_REPLICA_HOSTS) + 1)]
+
+DATABASE_ROUTERS = ['appointment_system.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write.
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -140,10 +177,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'user.User'
 
 
+REDIS_URL = 'redis://127.0.0.1:6379'
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': "redis://127.0.0.1:6379",
+        'LOCATION': REDIS_URL,
     }
 }
 
@@ -153,16 +192,36 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    ]
+        'user.authentication.RoleClaimsAuthentication',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'appointment_system.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+PAGINATION_MAX_PAGE_SIZE = 200
+
+STREAMING_CHUNK_SIZE = 2000
+
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "user.authentication.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.authentication.RoleTokenRefreshSerializer",
+    "AUTH_TOKEN_CLASSES": ("user.authentication.RoleAccessToken",),
 }
 
+# Seconds the roles of a user stay cached after a role change made its
+# tokens' claims stale.
+ROLE_CACHE_TIMEOUT = 300
+
+# Every process mirrors the revoked tokens in a bloom filter sized for
+# REVOCATION_CAPACITY tokens at REVOCATION_ERROR_RATE false positives, and
+# rebuilds it from Redis every REVOCATION_SYNC_SECONDS.
+REVOCATION_CAPACITY = 100_000
+REVOCATION_ERROR_RATE = 0.001
+REVOCATION_SYNC_SECONDS = 60
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -172,9 +231,108 @@ CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Seconds between outbox dispatcher ticks, which also bounds how long one
+# tick runs, and events claimed per batch. Handlers are dotted paths per
+# event topic, e.g. {'appointment.created': ['myapp.handlers.notify']}.
+# An event failing `OUTBOX_MAX_ATTEMPTS` times is kept without retries.
+OUTBOX_DISPATCH_INTERVAL = 5
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_HANDLERS = {}
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_BACKOFF = 5
+OUTBOX_RETRY_BACKOFF_MAX = 600
+
 CELERY_BEAT_SCHEDULE = {
     'send_appointment_sms_at_midnight': {
-        'task': 'myapp.tasks.send_appointment_sms',
+        'task': 'appointment.tasks.send_appointment_sms',
         'schedule': crontab(hour=0, minute=0),
     },
-}
\ No newline at end of file
+    'generate_slot_occurrences_daily': {
+        'task': 'appointment.tasks.generate_slot_occurrences',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'reconcile_slot_reservations': {
+        'task': 'appointment.tasks.reconcile_slot_reservations',
+        'schedule': crontab(minute='*/10'),
+    },
+    'create_appointment_partitions_daily': {
+        'task': 'appointment.tasks.create_appointment_partitions',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'send_patient_reminders': {
+        'task': 'appointment.tasks.send_patient_reminders',
+        'schedule': crontab(),
+    },
+    'reschedule_patient_reminders_daily': {
+        'task': 'appointment.tasks.reschedule_patient_reminders',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'dispatch_outbox': {
+        'task': 'outbox.tasks.dispatch_outbox',
+        'schedule': OUTBOX_DISPATCH_INTERVAL,
+    },
+    'archive_appointment_partitions_monthly': {
+        'task': 'appointment.tasks.archive_appointment_partitions',
+        'schedule': crontab(hour=2, minute=0, day_of_month=1),
+    },
+}
+
+# Number of weeks ahead patients can see and book.
+BOOKING_WINDOW_WEEKS = 12
+
+# Seconds medic availability stays cached, and seconds a cache miss may
+# wait for another request computing the same entry.
+AVAILABILITY_CACHE_TIMEOUT = 300
+AVAILABILITY_CACHE_LOCK_TIMEOUT = 5
+
+# Number of weeks ahead for which slot occurrences are generated.
+SLOT_OCCURRENCE_WEEKS = BOOKING_WINDOW_WEEKS
+
+# 'database' locks the slot occurrence row while booking, 'redis' reserves
+# the place in Redis first and only then writes the appointment.
+BOOKING_BACKEND = 'database'
+
+# Seconds a Redis reservation may stay unconfirmed before reconciliation
+# gives its place back.
+BOOKING_RESERVATION_GRACE = 60
+
+# Months ahead for which monthly appointment partitions are created, past
+# the end of the booking window, months of past appointments kept in the
+# partitioned table before being archived, and bytes per stored chunk of
+# an archive.
+APPOINTMENT_PARTITION_MONTHS_AHEAD = 4
+APPOINTMENT_HOT_MONTHS = 12
+APPOINTMENT_ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+# One-time passwords stay valid for OTP_TTL seconds, and no new one is sent
+# before then. Each phone number and each client IP may request
+# OTP_PHONE_LIMIT and OTP_IP_LIMIT codes, and make as many wrong guesses,
+# per OTP_WINDOW seconds.
+OTP_TTL = 120
+OTP_WINDOW = 300
+OTP_PHONE_LIMIT = 5
+OTP_IP_LIMIT = 20
+
+# SMS provider class, the messages it takes per request, and the messages
+# per second all workers together may send through it.
+SMS_PROVIDER = 'sms.providers.ConsoleProvider'
+SMS_BATCH_SIZE = 100
+SMS_RATE_LIMIT = 50
+
+# Failed batches are retried up to SMS_MAX_RETRIES times, after jittered
+# delays doubling from SMS_RETRY_BACKOFF up to SMS_RETRY_BACKOFF_MAX seconds.
+SMS_MAX_RETRIES = 5
+SMS_RETRY_BACKOFF = 5
+SMS_RETRY_BACKOFF_MAX = 600
+
+# Appointment rows fetched per round trip while streaming the nightly
+# medic digests, medics per reminder task, and seconds a sent reminder is
+# remembered so that no retry sends it again.
+REMINDER_CHUNK_SIZE = 2000
+REMINDER_BATCH_SIZE = 100
+REMINDER_DEDUP_SECONDS = 2 * 24 * 60 * 60
+
+# Seconds before an appointment its patient is reminded of it, and due
+# reminders sent per batch.
+PATIENT_REMINDER_LEADS = [24 * 60 * 60, 2 * 60 * 60]
+PATIENT_REMINDER_BATCH_SIZE = 500
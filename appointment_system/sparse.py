@@ -0,0 +1,131 @@
+from rest_framework import serializers
+
+from .serializers import model_field
+
+
+def parse_fields(value):
+    """
+    Turn `id,medical_record.medic.user.first_name` into a tree of field
+    names, an empty dict standing for the whole field.
+    """
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def requested_fields(request):
+    if request is None or request.method != 'GET':
+        return {}, {}
+
+    params = getattr(request, 'query_params', request.GET)
+    return parse_fields(params.get('fields')), \
+        parse_fields(params.get('exclude'))
+
+
+def prune(fields, include, exclude):
+    for name in list(fields):
+        if include and name not in include \
+                or name in exclude and not exclude[name]:
+            fields.pop(name)
+            continue
+
+        field = getattr(fields[name], 'child', fields[name])
+        if isinstance(field, SparseFieldsMixin):
+            field.sparse_fields = (include.get(name) or {},
+                                   exclude.get(name) or {})
+            if 'fields' in field.__dict__:
+                # Built already, as serializers tweaking fields in __init__ do.
+                prune(field.fields, *field.sparse_fields)
+    return fields
+
+
+class SparseFieldsMixin:
+    """
+    Narrow the output of GET requests to the `fields` query parameter, or
+    drop the ones listed in `exclude`. Nested fields are addressed with
+    dots, as in `?fields=id,medical_record.medic.user.first_name`.
+    """
+    sparse_fields = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        sparse_fields = self.sparse_fields
+        if sparse_fields is None and self.root in (self, self.parent):
+            sparse_fields = requested_fields(self.context.get('request'))
+
+        return prune(fields, *(sparse_fields or ({}, {})))
+
+
+def queryset_fields(serializer, prefix=''):
+    """
+    Return the columns and the joins `serializer` reads, or None when one
+    of its fields is not backed by a plain model column.
+    """
+    model = serializer.Meta.model
+    columns, related = [], []
+
+    for field in serializer._readable_fields:
+        column = model_field(model, field.source_attrs[0]) \
+            if len(field.source_attrs) == 1 else None
+
+        if column is None or column.many_to_many:
+            return None
+
+        path = prefix + column.name
+        columns.append(path)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not isinstance(field, serializers.ModelSerializer):
+                return None
+
+            nested = queryset_fields(field, path + '__')
+            if nested is None:
+                return None
+
+            related.append(path)
+            columns += nested[0]
+            related += nested[1]
+
+    return columns, related
+
+
+def sparse_queryset(queryset, serializer, ordering=()):
+    """
+    Load only the columns and joins the pruned `serializer` renders.
+    """
+    serializer = getattr(serializer, 'template_serializer', serializer)
+    if not isinstance(serializer, serializers.ModelSerializer) \
+            or serializer.Meta.model is not queryset.model:
+        return queryset
+
+    fields = queryset_fields(serializer)
+    if fields is None:
+        return queryset
+
+    columns, related = fields
+    columns += [name.lstrip('-') for name in ordering]
+
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseFieldsViewMixin:
+    """
+    Fetch only what the sparse fieldset of a GET request renders.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        include, exclude = requested_fields(self.request)
+        if not include and not exclude:
+            return queryset
+
+        return sparse_queryset(queryset, self.get_serializer(),
+                               getattr(self, 'cursor_ordering', ()))
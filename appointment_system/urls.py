@@ -17,6 +17,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import DatabaseMetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('djoser.urls')),
@@ -25,4 +27,5 @@ urlpatterns = [
     path('c/', include('clinic.urls')),
     path('a/', include('appointment.urls')),
     path('m/', include('medical_records.urls')),
+    path('metrics/database/', DatabaseMetricsView.as_view(), name='database-metrics'),
 ]
@@ -0,0 +1,19 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from outbox.dispatch import outbox_metrics
+
+from .pools import pool_metrics
+from .routers import query_counts
+
+
+class DatabaseMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'queries': dict(query_counts),
+            'pools': pool_metrics(),
+            'outbox': outbox_metrics(),
+        })
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
+from appointment_system.sparse import SparseFieldsMixin
+
 from .models import Clinic
 
 
-class ClinicSerializer(serializers.ModelSerializer):
+class ClinicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Clinic
         fields = ['id', 'name', 'address', 'clinic_serial', 'image']
@@ -14,7 +16,7 @@ class ClinicSerializer(serializers.ModelSerializer):
         return value
 
 
-class AdminClinicSerializer(serializers.ModelSerializer):
+class AdminClinicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Clinic
         fields = ['id', 'name', 'address',
@@ -3,11 +3,13 @@ from rest_framework.permissions import IsAdminUser, AllowAny
 
 from .models import Clinic
 from .serializers import AdminClinicSerializer, ClinicSerializer
+from appointment_system.sparse import SparseFieldsViewMixin
 from user.permissions import IsMedicOrAdmin
 
 
-class ClinicViewSet(ModelViewSet):
+class ClinicViewSet(SparseFieldsViewMixin, ModelViewSet):
     serializer_class = ClinicSerializer
+    cursor_ordering = ('clinic_serial', 'id')
 
     def get_serializer_class(self):
         user = self.request.user
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0009_delete_prescription'),
+        ('user', '0023_medic_specialization_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['medic', 'id'], name='medical_record_medic_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', 'id'], name='medical_record_patient_id_idx'),
+        ),
+    ]
@@ -1,10 +1,11 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from outbox.models import OutboxMixin
 from user.models import Medic, Patient
 
 
-class MedicalRecord(models.Model):
+class MedicalRecord(OutboxMixin, models.Model):
     patient = models.ForeignKey(
         Patient,
         on_delete=models.DO_NOTHING,
@@ -42,8 +43,21 @@ class MedicalRecord(models.Model):
         null=True
     )
 
+    # Only ids, the record itself stays out of the outbox.
+    outbox_fields = ['id', 'patient_id', 'medic_id']
+
     def __str__(self) -> str:
         return f'patient: {self.patient} -> medic: {self.medic}'
 
     class Meta:
         unique_together = ('patient', 'medic')
+        indexes = [
+            models.Index(
+                fields=['medic', 'id'],
+                name='medical_record_medic_id_idx'
+            ),
+            models.Index(
+                fields=['patient', 'id'],
+                name='medical_record_patient_id_idx'
+            ),
+        ]
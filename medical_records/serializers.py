@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from appointment_system.serializers import CompiledReadSerializer
+from appointment_system.sparse import SparseFieldsMixin
 from user.serializers import MedicSerializer, PatientSerializer
 
 from .models import MedicalRecord
@@ -19,7 +21,7 @@ class POSTMedicalRecordSerializer(serializers.ModelSerializer):
         return super().save(**kwargs)
 
 
-class GETMedicalRecordSerializer(serializers.ModelSerializer):
+class GETMedicalRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     medic = MedicSerializer(read_only=True)
     patient = PatientSerializer()
 
@@ -27,3 +29,7 @@ class GETMedicalRecordSerializer(serializers.ModelSerializer):
         model = MedicalRecord
         fields = ['medic', 'patient', 'illnes_subject',
                   'illness', 'hospitalized']
+
+
+class CompiledGETMedicalRecordSerializer(CompiledReadSerializer):
+    template = GETMedicalRecordSerializer
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from medical_records.models import MedicalRecord
+from user.models import Medic, Patient
+
+User = get_user_model()
+
+
+class MedicalRecordViewSetQueryTest(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.medic_user = User.objects.create_user(
+            phone_number='786534', first_name='ali', last_name='mosavi', age=45, is_medic=True)
+        self.medic = Medic.objects.create(
+            user=self.medic_user, specialization='hand', medical_system_number='32432', accepted=True)
+        self.patient_count = 0
+        self.add_record()
+
+    def add_record(self):
+        self.patient_count += 1
+        patient = Patient.objects.create(user=User.objects.create_user(
+            phone_number=f'0935{self.patient_count:07}', first_name='ahmad',
+            last_name='keyvani', age=45, is_patient=True))
+        return MedicalRecord.objects.create(
+            medic=self.medic, patient=patient, illnes_subject='Flu')
+
+    def test_list_runs_constant_queries(self):
+        self.client.force_authenticate(user=self.medic_user)
+        url = reverse('medical_record-list')
+
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+
+        for _ in range(5):
+            self.add_record()
+
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(first), len(second))
@@ -3,30 +3,35 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import Response, status
 from rest_framework.exceptions import ValidationError
 
+from appointment_system.sparse import SparseFieldsViewMixin
 from user.permissions import IsMedicOrAdmin, IsPatientOrAdmin
 
 from .models import MedicalRecord
-from .serializers import GETMedicalRecordSerializer, POSTMedicalRecordSerializer
+from .serializers import CompiledGETMedicalRecordSerializer, POSTMedicalRecordSerializer
 
 
-class MedicalRecordViewSet(ModelViewSet):
+class MedicalRecordViewSet(SparseFieldsViewMixin, ModelViewSet):
     def get_queryset(self):
         user = self.request.user
+        records = MedicalRecord.objects.all()
+
+        if self.request.method == 'GET':
+            records = records.select_related('medic__user', 'patient__user')
 
         if user.is_staff or user.is_superuser:
-            return MedicalRecord.objects.all()
+            return records
 
         if user.is_medic:
-            return MedicalRecord.objects.filter(medic=user.medic)
+            return records.filter(medic=user.medic)
 
         elif user.is_patient:
-            return MedicalRecord.objects.filter(patient=user.patient)
+            return records.filter(patient=user.patient)
 
-        return MedicalRecord.objects.none()
+        return records.none()
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
-            return GETMedicalRecordSerializer
+            return CompiledGETMedicalRecordSerializer
 
         return POSTMedicalRecordSerializer
 
@@ -0,0 +1,146 @@
+import time as clock
+
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from appointment_system.redis_client import get_redis
+
+from .models import OutboxEvent
+
+
+def get_handlers(topic):
+    return [import_string(path)
+            for path in settings.OUTBOX_HANDLERS.get(topic, [])]
+
+
+def deliver(event):
+    for handler in get_handlers(event.topic):
+        handler(event)
+
+
+def retry_at(attempts, now):
+    """
+    Return when an event that failed `attempts` times is tried again, at
+    least `OUTBOX_RETRY_BACKOFF` seconds later, or None once it has used
+    up `OUTBOX_MAX_ATTEMPTS`.
+    """
+    if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        return None
+
+    backoff = settings.OUTBOX_RETRY_BACKOFF + get_exponential_backoff_interval(
+        factor=settings.OUTBOX_RETRY_BACKOFF,
+        retries=attempts - 1,
+        maximum=settings.OUTBOX_RETRY_BACKOFF_MAX,
+        full_jitter=True,
+    )
+    return now + timezone.timedelta(
+        seconds=min(backoff, settings.OUTBOX_RETRY_BACKOFF_MAX))
+
+
+def dispatch_batch(size):
+    """
+    Claim up to `size` available events, skipping those another dispatcher
+    holds, and deliver each to the handlers of its topic.
+
+    Delivered events are deleted and failed ones put off with exponential
+    backoff, in the transaction that claimed them, so the events of a
+    dispatcher dying midway are delivered again. Handlers must therefore
+    bear seeing an event twice.
+    """
+    now = timezone.now()
+    delivered, failed = [], []
+
+    with transaction.atomic():
+        events = OutboxEvent.objects.select_for_update(skip_locked=True)\
+            .filter(available_at__lte=now)\
+            .order_by('available_at', 'id')[:size]
+
+        for event in events:
+            try:
+                with transaction.atomic():
+                    deliver(event)
+            except Exception as error:
+                event.attempts += 1
+                event.last_error = repr(error)
+                event.available_at = retry_at(event.attempts, now)
+                failed.append(event)
+            else:
+                delivered.append(event)
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in delivered]).delete()
+        OutboxEvent.objects.bulk_update(
+            failed, ['attempts', 'last_error', 'available_at'])
+
+    DispatchMetrics().record(
+        len(delivered), len(failed),
+        sum((timezone.now() - event.created_at).total_seconds() for event in delivered))
+    return len(delivered) + len(failed)
+
+
+class DispatchMetrics:
+    """
+    Events delivered and failed, and the sum of the delivered ones' lag
+    from creation, per minute in Redis across every dispatcher.
+    """
+    key_prefix = 'outbox:metrics'
+    window = 5
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def key(self, minute):
+        return f'{self.key_prefix}:{minute}'
+
+    def record(self, delivered, failed, lag, now=None):
+        if not delivered and not failed:
+            return
+
+        key = self.key(int((clock.time() if now is None else now) // 60))
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(key, 'delivered', delivered)
+        pipe.hincrby(key, 'failed', failed)
+        pipe.hincrbyfloat(key, 'lag', lag)
+        pipe.expire(key, (self.window + 1) * 60)
+        pipe.execute()
+
+    def totals(self, now=None):
+        """
+        Sum the counters of the last `window` whole minutes.
+        """
+        minute = int((clock.time() if now is None else now) // 60)
+        pipe = self.client.pipeline(transaction=False)
+        for past in range(minute - self.window, minute):
+            pipe.hgetall(self.key(past))
+
+        totals = {'delivered': 0, 'failed': 0, 'lag': 0.0}
+        for counters in pipe.execute():
+            for field, value in counters.items():
+                totals[field.decode()] += float(value)
+        return totals
+
+
+def outbox_metrics():
+    """
+    Return the events waiting and given up on, the age of the oldest one
+    waiting, and over the last minutes the events delivered and failed per
+    minute and their mean lag from creation to delivery.
+    """
+    backlog = OutboxEvent.objects.filter(available_at__isnull=False)\
+        .aggregate(pending=Count('id'), oldest=Min('created_at'))
+    totals = DispatchMetrics().totals()
+    window = DispatchMetrics.window
+
+    return {
+        'pending': backlog['pending'],
+        'dead': OutboxEvent.objects.filter(available_at__isnull=True).count(),
+        'oldest_pending_seconds': (timezone.now() - backlog['oldest']).total_seconds()
+        if backlog['oldest'] else 0,
+        'delivered_per_minute': totals['delivered'] / window,
+        'failed_per_minute': totals['failed'] / window,
+        'dispatch_lag_ms': totals['lag'] * 1000 / totals['delivered']
+        if totals['delivered'] else 0,
+    }
@@ -0,0 +1,73 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class OutboxEvent(models.Model):
+    """
+    A change waiting to be delivered to the handlers of its topic. Events
+    are deleted once delivered. One that keeps failing past
+    `OUTBOX_MAX_ATTEMPTS` is kept with no `available_at`.
+    """
+    topic = models.CharField(
+        _('topic'),
+        max_length=100
+    )
+
+    payload = models.JSONField(
+        _('payload'),
+        encoder=DjangoJSONEncoder
+    )
+
+    created_at = models.DateTimeField(
+        _('created at'),
+        default=timezone.now
+    )
+
+    available_at = models.DateTimeField(
+        _('available at'),
+        default=timezone.now,
+        blank=True,
+        null=True
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        _('attempts'),
+        default=0
+    )
+
+    last_error = models.TextField(
+        _('last error'),
+        blank=True
+    )
+
+    def __str__(self) -> str:
+        return f'{self.topic} #{self.id}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='outbox_event_available_idx',
+                condition=Q(available_at__isnull=False)
+            ),
+        ]
+
+
+class OutboxMixin:
+    """
+    Models whose saves and deletes are recorded in the outbox, as
+    `<model name>.created`, `.updated` or `.deleted` events carrying their
+    `outbox_fields`. Saves run in a transaction so the event is committed
+    with the row. Queryset updates are not recorded.
+    """
+    outbox_fields = ['id']
+
+    def outbox_payload(self):
+        return {field: getattr(self, field) for field in self.outbox_fields}
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
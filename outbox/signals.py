@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import OutboxEvent, OutboxMixin
+
+
+def publish(instance, action):
+    OutboxEvent.objects.using(instance._state.db).create(
+        topic=f'{instance._meta.model_name}.{action}',
+        payload=instance.outbox_payload())
+
+
+# Both run inside the transaction of the save or delete.
+@receiver(post_save)
+def publish_saved(sender, instance, created, raw=False, **kwargs):
+    if isinstance(instance, OutboxMixin) and not raw:
+        publish(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete)
+def publish_deleted(sender, instance, **kwargs):
+    if isinstance(instance, OutboxMixin):
+        publish(instance, 'deleted')
@@ -0,0 +1,22 @@
+import time as clock
+
+from celery import shared_task
+from django.conf import settings
+
+from .dispatch import dispatch_batch
+
+
+@shared_task
+def dispatch_outbox():
+    """
+    Dispatch batches of `OUTBOX_BATCH_SIZE` events until none is left or
+    `OUTBOX_DISPATCH_INTERVAL` passes, when the next tick takes over.
+    """
+    deadline = clock.monotonic() + settings.OUTBOX_DISPATCH_INTERVAL
+    dispatched = 0
+    while clock.monotonic() < deadline:
+        count = dispatch_batch(settings.OUTBOX_BATCH_SIZE)
+        dispatched += count
+        if count < settings.OUTBOX_BATCH_SIZE:
+            break
+    return dispatched
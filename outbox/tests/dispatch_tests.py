@@ -0,0 +1,139 @@
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from appointment.booking import book_appointment
+from appointment.models import Prescription
+from appointment.tests.booking_tests import BookingMixin
+from outbox.dispatch import DispatchMetrics, dispatch_batch, outbox_metrics, retry_at
+from outbox.models import OutboxEvent
+from outbox.tasks import dispatch_outbox
+
+delivered = []
+
+
+def record(event):
+    delivered.append((event.topic, event.payload))
+
+
+def fail(event):
+    raise RuntimeError('handler down')
+
+
+class OutboxEventTest(BookingMixin, TestCase):
+    def test_changes_are_recorded(self):
+        appointment = book_appointment(
+            self.create_slot(capacity=1), self.create_patients(1)[0])
+
+        events = {event.topic: event.payload for event in OutboxEvent.objects.all()}
+        self.assertEqual(events['prescription.created'],
+                         {'id': appointment.prescription_id})
+        self.assertEqual(events['appointment.created']['id'], appointment.id)
+        self.assertEqual(events['appointment.created']['medic_id'], appointment.medic_id)
+
+        appointment_id = appointment.id
+        appointment.delete()
+        self.assertTrue(OutboxEvent.objects.filter(
+            topic='appointment.deleted', payload__id=appointment_id).exists())
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Prescription.objects.create(prescription_number='1', drugs='')
+            raise RuntimeError
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+@override_settings(OUTBOX_HANDLERS={
+    'prescription.created': ['outbox.tests.dispatch_tests.record'],
+    'prescription.updated': ['outbox.tests.dispatch_tests.fail'],
+})
+class DispatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        delivered.clear()
+
+    def test_delivered_events_are_deleted(self):
+        prescriptions = [Prescription.objects.create(prescription_number=str(index), drugs='')
+                         for index in range(3)]
+
+        self.assertEqual(dispatch_outbox(), 3)
+        self.assertEqual(delivered, [('prescription.created', {'id': prescription.id})
+                                     for prescription in prescriptions])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_events_are_retried_then_kept(self):
+        prescription = Prescription.objects.create(prescription_number='1', drugs='')
+        prescription.save()
+
+        now = timezone.now()
+        self.assertEqual(dispatch_batch(10), 2)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('handler down', event.last_error)
+        self.assertGreaterEqual(event.available_at, now + timezone.timedelta(
+            seconds=settings.OUTBOX_RETRY_BACKOFF))
+
+        self.assertEqual(dispatch_batch(10), 0)
+        OutboxEvent.objects.update(available_at=timezone.now())
+        dispatch_batch(10)
+
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 2)
+        self.assertIsNone(event.available_at)
+        self.assertEqual(outbox_metrics()['dead'], 1)
+
+    def test_retries_wait_at_least_the_backoff(self):
+        now = timezone.now()
+        with mock.patch('celery.utils.time.random.randrange', return_value=0):
+            self.assertEqual(retry_at(1, now), now + timezone.timedelta(
+                seconds=settings.OUTBOX_RETRY_BACKOFF))
+
+    def test_metrics(self):
+        Prescription.objects.create(prescription_number='1', drugs='')
+        metrics = outbox_metrics()
+        self.assertEqual(metrics['pending'], 1)
+        self.assertGreaterEqual(metrics['oldest_pending_seconds'], 0)
+
+        recorder = DispatchMetrics()
+        recorder.record(4, 1, 2.0, now=600)
+        recorder.record(6, 0, 3.0, now=659)
+        self.assertEqual(recorder.totals(now=660),
+                         {'delivered': 10, 'failed': 1, 'lag': 5.0})
+        self.assertEqual(recorder.totals(now=60 * 20)['delivered'], 0)
+
+
+@override_settings(OUTBOX_HANDLERS={
+    'prescription.created': ['outbox.tests.dispatch_tests.record']})
+class ConcurrentDispatchTest(TransactionTestCase):
+    def test_claimed_events_are_skipped(self):
+        cache.clear()
+        delivered.clear()
+        first, second = [Prescription.objects.create(prescription_number=str(index), drugs='')
+                         for index in range(2)]
+        claimed, done = threading.Event(), threading.Event()
+
+        def hold_first():
+            with transaction.atomic():
+                OutboxEvent.objects.select_for_update()\
+                    .filter(payload__id=first.id).get()
+                claimed.set()
+                done.wait(10)
+            connection.close()
+
+        holder = threading.Thread(target=hold_first)
+        holder.start()
+        claimed.wait(10)
+        try:
+            self.assertEqual(dispatch_batch(10), 1)
+            self.assertEqual(delivered, [('prescription.created', {'id': second.id})])
+        finally:
+            done.set()
+            holder.join()
+
+        self.assertEqual(dispatch_batch(10), 1)
@@ -0,0 +1,20 @@
+from django.conf import settings
+
+from .tasks import deliver_sms
+
+
+def send_sms(phone_number, text):
+    """
+    Queue one message, sent outside the request.
+    """
+    send_bulk_sms([{'phone_number': phone_number, 'text': text}])
+
+
+def send_bulk_sms(messages):
+    """
+    Queue `messages` in batches of the provider's size.
+    """
+    messages = list(messages)
+    batch_size = settings.SMS_BATCH_SIZE
+    for start in range(0, len(messages), batch_size):
+        deliver_sms.delay(messages[start:start + batch_size])
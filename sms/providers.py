@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class SMSProviderError(Exception):
+    pass
+
+
+class SMSProvider:
+    """
+    Sends messages, each a dict with a `phone_number` and a `text`, up to
+    `SMS_BATCH_SIZE` per call.
+    """
+
+    @property
+    def name(self):
+        return f'{type(self).__module__}.{type(self).__qualname__}'
+
+    def send_batch(self, messages):
+        """
+        Send `messages` and return the ones worth trying again. Raise
+        SMSProviderError when the whole batch failed.
+        """
+        raise NotImplementedError
+
+
+class ConsoleProvider(SMSProvider):
+    def send_batch(self, messages):
+        for message in messages:
+            print(f"sms sent to {message['phone_number']}: {message['text']}")
+        return []
+
+
+class FakeProvider(SMSProvider):
+    """
+    Keep the messages in `outbox` rather than sending them, for tests.
+    The next `failures` batches fail.
+    """
+    outbox = []
+    failures = 0
+
+    def send_batch(self, messages):
+        if FakeProvider.failures:
+            FakeProvider.failures -= 1
+            raise SMSProviderError('Provider unavailable.')
+
+        FakeProvider.outbox.extend(messages)
+        return []
+
+
+def get_provider():
+    return import_string(settings.SMS_PROVIDER)()
@@ -0,0 +1,41 @@
+import time as clock
+
+from appointment_system.redis_client import get_redis
+
+# KEYS: window  ARGV: count, limit
+ACQUIRE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used > 0 and used + tonumber(ARGV[1]) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], 2)
+return 1
+"""
+
+
+class ProviderRateLimiter:
+    """
+    Messages sent through a provider per second, counted in Redis so the
+    limit holds across every worker. A batch larger than the limit is
+    only sent alone in its second.
+    """
+    key_prefix = 'sms:rate'
+
+    def __init__(self, provider, limit, client=None):
+        self.provider = provider
+        self.limit = limit
+        self.client = client or get_redis()
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+
+    def acquire(self, count, now=None):
+        """
+        Count `count` messages in the current second if they still fit, and
+        return 0. Otherwise return the seconds left until the next one.
+        """
+        now = clock.time() if now is None else now
+        second = int(now)
+        if self._acquire(keys=[f'{self.key_prefix}:{self.provider}:{second}'],
+                         args=[count, self.limit]):
+            return 0
+        return second + 1 - now
@@ -0,0 +1,41 @@
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+
+from .providers import SMSProviderError, get_provider
+from .ratelimit import ProviderRateLimiter
+
+
+@shared_task(bind=True, max_retries=None)
+def deliver_sms(self, messages, failures=0):
+    """
+    Send a batch of messages through the provider, within its rate limit,
+    retrying what failed with exponential backoff. A batch over the limit
+    is put off to the next second rather than waited for, which does not
+    count as a failure.
+    """
+    provider = get_provider()
+    wait = ProviderRateLimiter(provider.name, settings.SMS_RATE_LIMIT)\
+        .acquire(len(messages))
+    if wait:
+        raise self.retry(args=[messages], kwargs={'failures': failures},
+                         countdown=wait)
+
+    try:
+        failed = provider.send_batch(messages)
+    except SMSProviderError:
+        failed = messages
+
+    if not failed:
+        return len(messages)
+
+    if failures >= settings.SMS_MAX_RETRIES:
+        raise SMSProviderError(f'{len(failed)} messages could not be sent.')
+
+    raise self.retry(args=[failed], kwargs={'failures': failures + 1},
+                     countdown=get_exponential_backoff_interval(
+                         factor=settings.SMS_RETRY_BACKOFF,
+                         retries=failures,
+                         maximum=settings.SMS_RETRY_BACKOFF_MAX,
+                         full_jitter=True,
+                     ))
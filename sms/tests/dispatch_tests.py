@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from appointment_system.celery import app
+from sms.dispatch import send_bulk_sms, send_sms
+from sms.providers import FakeProvider, SMSProviderError
+from sms.ratelimit import ProviderRateLimiter
+from sms.tasks import deliver_sms
+
+
+def messages(count):
+    return [{'phone_number': f'0912{index:07}', 'text': f'message {index}'}
+            for index in range(count)]
+
+
+@override_settings(SMS_PROVIDER='sms.providers.FakeProvider', SMS_BATCH_SIZE=2)
+class DeliverSMSTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeProvider.outbox.clear()
+        FakeProvider.failures = 0
+
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def test_send_sms(self):
+        send_sms('09120000000', 'hello')
+        self.assertEqual(FakeProvider.outbox, [
+            {'phone_number': '09120000000', 'text': 'hello'}])
+
+    def test_bulk_sms_is_sent_in_batches(self):
+        send_bulk_sms(messages(5))
+        self.assertEqual(FakeProvider.outbox, messages(5))
+
+    def test_failed_batches_are_retried(self):
+        FakeProvider.failures = 2
+        self.assertEqual(deliver_sms.apply(args=[messages(2)]).get(), 2)
+        self.assertEqual(FakeProvider.outbox, messages(2))
+
+    def test_rate_limited_batches_are_put_off(self):
+        with patch.object(ProviderRateLimiter, 'acquire', return_value=0.75), \
+                patch.object(deliver_sms, 'retry', side_effect=Retry) as retry:
+            result = deliver_sms.apply(args=[messages(2)])
+
+        self.assertIsInstance(result.result, Retry)
+        self.assertEqual(retry.call_args.kwargs['countdown'], 0.75)
+        self.assertEqual(retry.call_args.kwargs['kwargs'], {'failures': 0})
+        self.assertEqual(FakeProvider.outbox, [])
+
+    @override_settings(SMS_MAX_RETRIES=2)
+    def test_gives_up_after_max_retries(self):
+        FakeProvider.failures = 10
+        result = deliver_sms.apply(args=[messages(2)])
+
+        self.assertTrue(result.failed())
+        self.assertIsInstance(result.result, SMSProviderError)
+        self.assertEqual(FakeProvider.failures, 7)
+        self.assertEqual(FakeProvider.outbox, [])
+
+
+class ProviderRateLimiterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = ProviderRateLimiter('fake', 3)
+
+    def test_messages_per_second(self):
+        self.assertEqual(self.limiter.acquire(2, now=100), 0)
+        self.assertEqual(self.limiter.acquire(2, now=100.5), 0.5)
+        self.assertEqual(self.limiter.acquire(1, now=100.5), 0)
+        self.assertEqual(self.limiter.acquire(2, now=101), 0)
+
+    def test_large_batch_goes_alone(self):
+        self.assertEqual(self.limiter.acquire(5, now=100), 0)
+        self.assertGreater(self.limiter.acquire(1, now=100), 0)
+
+    def test_limit_is_per_provider(self):
+        self.assertEqual(self.limiter.acquire(3, now=100), 0)
+        self.assertEqual(ProviderRateLimiter('other', 3).acquire(3, now=100), 0)
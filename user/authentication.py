@@ -0,0 +1,155 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import User
+from .revocation import get_revocation_list
+
+USER_FIELDS = ['is_active', 'is_staff', 'is_superuser', 'is_medic', 'is_patient']
+ROLE_CLAIMS = USER_FIELDS + ['medic_id', 'patient_id', 'accepted']
+
+
+def roles_version(user_id):
+    key = f'user:{user_id}:roles:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user_roles(user_id):
+    cache.set(f'user:{user_id}:roles:version', uuid4().hex, None)
+
+
+def load_roles(user_id):
+    roles = User.objects.filter(pk=user_id).values(
+        *USER_FIELDS,
+        medic_id=F('medic__id'),
+        patient_id=F('patient__id'),
+        accepted=F('medic__accepted'),
+    ).first()
+
+    if roles is not None:
+        roles['accepted'] = bool(roles['accepted'])
+    return roles
+
+
+def cached_roles(user_id, version):
+    key = f'user:{user_id}:roles:{version}'
+    roles = cache.get(key)
+    if roles is None:
+        roles = load_roles(user_id)
+        if roles is not None:
+            cache.set(key, roles, settings.ROLE_CACHE_TIMEOUT)
+    return roles
+
+
+def user_roles(user):
+    """
+    Return the role claims of `user`, read from its token or, for users
+    authenticated otherwise, from the database.
+    """
+    roles = getattr(user, 'roles', None)
+    if roles is None:
+        roles = load_roles(user.pk)
+    return roles
+
+
+def claims_user(user_id, roles):
+    """
+    Build a user holding only its role fields. The rest of its row is
+    loaded on first access.
+    """
+    values = {'id': user_id, **{field: roles[field] for field in USER_FIELDS}}
+    field_names = [field.attname for field in User._meta.concrete_fields
+                   if field.attname in values]
+
+    user = User.from_db(None, field_names, [values[name] for name in field_names])
+    user.roles = roles
+    return user
+
+
+def revoke_token(token):
+    get_revocation_list().revoke_token(
+        token[api_settings.JTI_CLAIM], token['exp'])
+
+
+def revoke_user_tokens(user_id):
+    get_revocation_list().revoke_user(user_id)
+
+
+class RevocationMixin:
+    def verify(self):
+        super().verify()
+
+        if get_revocation_list().is_revoked(
+                self.payload.get(api_settings.JTI_CLAIM),
+                self.payload.get(api_settings.USER_ID_CLAIM),
+                self.payload.get('iat', 0)):
+            raise TokenError(_('Token is revoked'))
+
+
+class RoleAccessToken(RevocationMixin, AccessToken):
+    pass
+
+
+class RoleRefreshToken(RevocationMixin, RefreshToken):
+    """
+    Refresh token carrying the role claims of its user, which the access
+    tokens made from it inherit.
+    """
+    access_token_class = RoleAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        version = roles_version(user.id)
+        token = super().for_user(user)
+
+        token['roles_version'] = version
+        for claim, value in load_roles(user.id).items():
+            token[claim] = value
+        return token
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RoleRefreshToken
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleRefreshToken
+
+
+class RoleClaimsAuthentication(JWTAuthentication):
+    """
+    Authenticate from the role claims of the token, without loading the
+    user. Claims older than the last role change of their user are
+    replaced by its current roles, cached for `ROLE_CACHE_TIMEOUT`.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        version = roles_version(user_id)
+        if validated_token.get('roles_version') == version:
+            roles = {claim: validated_token[claim] for claim in ROLE_CLAIMS}
+        else:
+            roles = cached_roles(user_id, version)
+            if roles is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not roles['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return claims_user(user_id, roles)
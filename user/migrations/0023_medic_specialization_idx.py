@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:08
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0022_alter_medic_image_alter_timeslot_avg_visit_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medic',
+            index=models.Index(django.db.models.functions.text.Upper('specialization'), name='medic_specialization_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from math import ceil
 from typing import Iterable
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
@@ -79,6 +80,13 @@ class User(AbstractUser):
             return self.get_full_name()
         return str(self.phone_number)
     
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Users built from token claims load the rest of their row at once.
+        deferred = self.get_deferred_fields()
+        if fields and deferred.issuperset(fields):
+            fields = list(deferred)
+        return super().refresh_from_db(using, fields, from_queryset)
+
     def save(self, *args, **kwargs):
         if self.is_medic == True:
             self.is_patient = False
@@ -180,6 +188,15 @@ class Medic(models.Model):
     def __str__(self) -> str:
         return f'{self.user} {self.specialization} specialize.'
 
+    class Meta:
+        indexes = [
+            # Specialization search is case insensitive.
+            models.Index(
+                Upper('specialization'),
+                name='medic_specialization_idx'
+            ),
+        ]
+
 
 class TimeSlot(models.Model):
     DAY_OF_WEEK_CHOICES = [
@@ -230,5 +247,25 @@ class TimeSlot(models.Model):
     def __str__(self):
         return f"{self.medic} - {self.day_of_week} {self.start_time} to {self.end_time} at {self.clinic.address}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_loaded()
+
+    def remember_loaded(self):
+        # The medic as stored, to tell when the slot is moved to another.
+        if 'medic_id' in self.__dict__:
+            self._loaded_medic_id = self.medic_id
+
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        self.remember_loaded()
+        return result
+
     class Meta:
         unique_together = ('medic', 'day_of_week')
@@ -0,0 +1,129 @@
+import secrets
+
+from django.conf import settings
+
+from appointment_system.redis_client import get_redis
+
+LIMIT_FUNCTIONS = """
+local function limited(key, limit)
+    return tonumber(redis.call('GET', key) or '0') >= tonumber(limit)
+end
+
+local function count(key, window)
+    if redis.call('INCR', key) == 1 then
+        redis.call('EXPIRE', key, window)
+    end
+end
+"""
+
+# KEYS: code, phone sends, ip sends
+# ARGV: code, ttl, window, phone limit, ip limit
+ISSUE_SCRIPT = LIMIT_FUNCTIONS + """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl > 0 then
+    return {-1, ttl}
+end
+for i = 2, 3 do
+    if limited(KEYS[i], ARGV[i + 2]) then
+        return {-2, redis.call('TTL', KEYS[i])}
+    end
+end
+
+count(KEYS[2], ARGV[3])
+count(KEYS[3], ARGV[3])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return {1, 0}
+"""
+
+# KEYS: code, phone failures, ip failures
+# ARGV: code, window, phone limit, ip limit
+VERIFY_SCRIPT = LIMIT_FUNCTIONS + """
+for i = 2, 3 do
+    if limited(KEYS[i], ARGV[i + 1]) then
+        return {-2, redis.call('TTL', KEYS[i])}
+    end
+end
+
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {1, 0}
+end
+
+count(KEYS[2], ARGV[2])
+count(KEYS[3], ARGV[2])
+return {0, 0}
+"""
+
+
+class OTPRefused(Exception):
+    def __init__(self, wait):
+        super().__init__(wait)
+        self.wait = wait
+
+
+class OTPCooldown(OTPRefused):
+    pass
+
+
+class OTPRateLimited(OTPRefused):
+    pass
+
+
+class OneTimePasswords:
+    """
+    One-time passwords and their rate limits kept in Redis.
+
+    Issuing and verifying are single script calls, so the limits are
+    checked and counted atomically. Each phone number and each client IP
+    may request `OTP_PHONE_LIMIT` and `OTP_IP_LIMIT` codes, and as many
+    wrong guesses, per `OTP_WINDOW` seconds.
+    """
+    key_prefix = 'otp'
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._issue = self.client.register_script(ISSUE_SCRIPT)
+        self._verify = self.client.register_script(VERIFY_SCRIPT)
+
+    def keys(self, kind, phone_number, ip):
+        return [f'{self.key_prefix}:code:{phone_number}',
+                f'{self.key_prefix}:{kind}:phone:{phone_number}',
+                f'{self.key_prefix}:{kind}:ip:{ip}']
+
+    def issue(self, phone_number, ip):
+        """
+        Return a new code for `phone_number`, unless the last one is still
+        valid or one of the limits is reached.
+        """
+        code = f'{secrets.randbelow(10 ** 6):06}'
+        result, wait = self._issue(
+            keys=self.keys('sends', phone_number, ip),
+            args=[code, settings.OTP_TTL, settings.OTP_WINDOW,
+                  settings.OTP_PHONE_LIMIT, settings.OTP_IP_LIMIT])
+
+        if result == -1:
+            raise OTPCooldown(wait)
+        if result == -2:
+            raise OTPRateLimited(wait)
+        return code
+
+    def discard(self, phone_number):
+        """
+        Drop the code of `phone_number`, so a code that never reached it
+        does not hold back the next.
+        """
+        self.client.delete(f'{self.key_prefix}:code:{phone_number}')
+
+    def verify(self, phone_number, ip, code):
+        """
+        Return whether `code` is the valid code of `phone_number`, using
+        it up if so.
+        """
+        result, wait = self._verify(
+            keys=self.keys('failures', phone_number, ip),
+            args=[code, settings.OTP_WINDOW,
+                  settings.OTP_PHONE_LIMIT, settings.OTP_IP_LIMIT])
+
+        if result == -2:
+            raise OTPRateLimited(wait)
+        return result == 1
@@ -1,15 +1,15 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .authentication import user_roles
+
 
 class IsMedicOrAdmin(BasePermission):
     def has_permission(self, request, view):
         user = request.user
         if user.is_staff or user.is_superuser:
             return True
-        try:
-            return user.medic.accepted and user.is_medic
-        except Exception:
-            return False
+        return user.is_authenticated and user.is_medic \
+            and user_roles(user)['accepted']
 
 
 class IsPatientOrAdmin(BasePermission):
@@ -17,10 +17,8 @@ class IsPatientOrAdmin(BasePermission):
         user = request.user
         if user.is_staff or user.is_superuser:
             return True
-        try:
-            return user.patient and user.is_patient
-        except Exception:
-            return False
+        return user.is_authenticated and user.is_patient \
+            and user_roles(user)['patient_id'] is not None
 
 
 class IsOwnerOrAdmin(BasePermission):
@@ -40,12 +38,13 @@ class IsAppointmentRelated(BasePermission):
         user = request.user
         if user.is_staff or user.is_superuser:
             return True
-        try:
-            if user.is_patient and user.patient:
-                return obj.patient.user == user
-            elif user.is_medic and user.medic:
-                return obj.time.medic.user == user
-        except Exception:
+        if not user.is_authenticated:
             return False
 
+        roles = user_roles(user)
+        if user.is_patient and roles['patient_id'] is not None:
+            return obj.patient_id == roles['patient_id']
+        elif user.is_medic and roles['medic_id'] is not None:
+            return obj.medic_id == roles['medic_id']
+
         return False
@@ -0,0 +1,177 @@
+import hashlib
+import math
+import os
+import threading
+import time as clock
+from functools import lru_cache
+
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.settings import api_settings
+
+from appointment_system.redis_client import get_redis
+
+
+class BloomFilter:
+    """
+    Set membership with false positives at `error_rate` up to `capacity`
+    items, and no false negatives.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big')
+        return [(first + index * second) % self.size
+                for index in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & 1 << (position & 7)
+                   for position in self.positions(item))
+
+
+def token_lifetime():
+    return max(api_settings.ACCESS_TOKEN_LIFETIME,
+               api_settings.REFRESH_TOKEN_LIFETIME).total_seconds()
+
+
+class RevocationList:
+    """
+    Revoked token ids, and per user the time before which its tokens are
+    revoked, kept in Redis and mirrored in every process.
+
+    The mirror keeps token ids in a bloom filter, so checking a token that
+    is not revoked costs no round trip, and a filter hit is confirmed in
+    Redis. A listener thread applies the revocations published by other
+    processes, and rebuilds the mirror every `REVOCATION_SYNC_SECONDS` to
+    drop expired entries and catch missed messages. While it is behind,
+    tokens are checked in Redis directly.
+    """
+    key_prefix = 'auth:revoked'
+    channel = 'auth:revocations'
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.tokens_key = f'{self.key_prefix}:tokens'
+        self.users_key = f'{self.key_prefix}:users'
+        self.lock = threading.Lock()
+        self.pid = None
+        self.synced_at = 0
+        self.filter = self.new_filter()
+        self.not_before = {}
+
+    def new_filter(self):
+        return BloomFilter(settings.REVOCATION_CAPACITY,
+                           settings.REVOCATION_ERROR_RATE)
+
+    def revoke_token(self, jti, expires_at):
+        self.publish(f'token:{jti}', lambda pipe: pipe.zadd(
+            self.tokens_key, {jti: expires_at}))
+
+    def revoke_user(self, user_id, at=None):
+        """
+        Revoke every token of `user_id` issued before `at`, by default
+        those issued up to now. Token `iat` claims are whole seconds, so
+        the default is the next whole second.
+        """
+        at = int(clock.time()) + 1 if at is None else at
+        self.publish(f'user:{user_id}:{at}', lambda pipe: pipe.hset(
+            self.users_key, user_id, at))
+
+    def publish(self, message, store):
+        pipe = self.client.pipeline()
+        store(pipe)
+        pipe.publish(self.channel, message)
+        pipe.execute()
+        self.apply(message)
+
+    def apply(self, message):
+        kind, _, value = message.partition(':')
+        if kind == 'token':
+            self.filter.add(value)
+        elif kind == 'user':
+            user_id, at = value.rsplit(':', 1)
+            self.not_before[user_id] = max(
+                float(at), self.not_before.get(user_id, 0))
+
+    def sync(self):
+        """
+        Rebuild the mirror from Redis, dropping what has expired.
+        """
+        now = clock.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.tokens_key, '-inf', now)
+        pipe.zrange(self.tokens_key, 0, -1)
+        pipe.hgetall(self.users_key)
+        _, tokens, users = pipe.execute()
+
+        token_filter, not_before, expired = self.new_filter(), {}, []
+        for jti in tokens:
+            token_filter.add(jti.decode())
+        for user_id, at in users.items():
+            if float(at) < now - token_lifetime():
+                expired.append(user_id)
+            else:
+                not_before[user_id.decode()] = float(at)
+        if expired:
+            self.client.hdel(self.users_key, *expired)
+
+        self.filter, self.not_before = token_filter, not_before
+        self.synced_at = now
+
+    def listen(self):
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.sync()
+                while True:
+                    message = pubsub.get_message(timeout=1)
+                    if message:
+                        self.apply(message['data'].decode())
+                    if clock.time() - self.synced_at >= settings.REVOCATION_SYNC_SECONDS:
+                        self.sync()
+            except RedisError:
+                clock.sleep(1)
+            finally:
+                pubsub.close()
+
+    def start(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.synced_at = 0
+                threading.Thread(target=self.listen, daemon=True).start()
+
+    def is_revoked(self, jti, user_id, issued_at):
+        if self.pid != os.getpid():
+            self.start()
+
+        if clock.time() - self.synced_at > 2 * settings.REVOCATION_SYNC_SECONDS:
+            pipe = self.client.pipeline()
+            pipe.zscore(self.tokens_key, jti)
+            pipe.hget(self.users_key, user_id)
+            revoked, not_before = pipe.execute()
+            return revoked is not None \
+                or not_before is not None and issued_at < float(not_before)
+
+        not_before = self.not_before.get(str(user_id))
+        if not_before is not None and issued_at < not_before:
+            return True
+        if jti in self.filter:
+            return self.client.zscore(self.tokens_key, jti) is not None
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_revocation_list():
+    return RevocationList()
@@ -1,13 +1,18 @@
+from datetime import timedelta
 from math import ceil
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
 from appointment.models import Appointment
+from appointment_system.sparse import SparseFieldsMixin
 from clinic.serializers import ClinicSerializer
 
 from .models import Medic, Patient, TimeSlot, User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     phone_number = serializers.CharField(read_only=True)
     first_name = serializers.CharField(required=True)
     last_name = serializers.CharField(required=True)
@@ -27,7 +32,7 @@ class VerifyOTPSerializer(serializers.Serializer):
     otp_code = serializers.CharField()
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -42,7 +47,8 @@ class PatientSerializer(serializers.ModelSerializer):
                            'blood_group', 'drug_allergy', 'special_medicine', 'systemic_diseases']
 
         for field in optional_fields:
-            self.fields[field].required = False
+            if field in self.fields:
+                self.fields[field].required = False
 
     def save(self, **kwargs):
         kwargs['user'] = self.context['request'].user
@@ -141,7 +147,7 @@ class UpdatePatientUserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class MedicSerializer(serializers.ModelSerializer):
+class MedicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -271,7 +277,7 @@ class UPDATEMedicAvailableTimeSerializer(serializers.ModelSerializer):
                   'start_time', 'end_time', 'avg_visit_time', 'avg_patient_visit', 'is_active']
 
 
-class GETMedicAvailableTimeSerializer(serializers.ModelSerializer):
+class GETMedicAvailableTimeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     medic = MedicSerializer(read_only=True)
     clinic = ClinicSerializer(read_only=True)
 
@@ -281,6 +287,49 @@ class GETMedicAvailableTimeSerializer(serializers.ModelSerializer):
                   'start_time', 'end_time', 'avg_visit_time', 'avg_patient_visit', 'is_active']
 
 
+class GETMedicAppointmentTimeSerializer(GETMedicAvailableTimeSerializer):
+    date = serializers.DateField(source='appointment_date', read_only=True)
+    remaining = serializers.IntegerField(read_only=True)
+
+    class Meta(GETMedicAvailableTimeSerializer.Meta):
+        fields = GETMedicAvailableTimeSerializer.Meta.fields + \
+            ['date', 'remaining']
+
+
+class AvailabilityRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, allow_null=True)
+    end = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        last = tomorrow + timedelta(weeks=settings.BOOKING_WINDOW_WEEKS) - timedelta(days=1)
+
+        start = attrs.get('start') or tomorrow
+        if not tomorrow <= start <= last:
+            raise serializers.ValidationError(
+                {'start': f'start must be between {tomorrow} and {last}.'})
+
+        end = attrs.get('end')
+        if end is None:
+            end = min(start + timedelta(weeks=4) - timedelta(days=1), last)
+        elif end < start:
+            raise serializers.ValidationError(
+                {'end': 'end must not be before start.'})
+        elif end > last:
+            raise serializers.ValidationError(
+                {'end': f'end must not be after {last}, '
+                        f'{settings.BOOKING_WINDOW_WEEKS} weeks from tomorrow.'})
+
+        return {**attrs, 'start': start, 'end': end}
+
+
+class EarliestAvailableSerializer(AvailabilityRangeSerializer):
+    specialization = serializers.CharField()
+    clinic = serializers.IntegerField(required=False, allow_null=True)
+    limit = serializers.IntegerField(
+        required=False, allow_null=True, min_value=1, max_value=50)
+
+
 class MedicOrPatientSerializers(serializers.Serializer):
     phone_number = serializers.CharField(source='user.phone_number')
     id = serializers.IntegerField()
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user_roles
+from .models import Medic, Patient, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_roles(sender, instance, **kwargs):
+    user_id = instance.id
+    transaction.on_commit(lambda: invalidate_user_roles(user_id))
+
+
+@receiver(post_save, sender=Medic)
+@receiver(post_delete, sender=Medic)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_profile_roles(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_roles(user_id))
@@ -1,12 +1,30 @@
-from django.test import TestCase
+import os
+import threading
+import time as clock
+from datetime import time as datetime_time, timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from django.core.cache import cache
-from rest_framework.test import APITestCase, APIClient
-
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from appointment.availability import cached_availability
+from appointment.booking import book_appointment, next_appointment_date
 from clinic.models import Clinic
+from user.authentication import RoleClaimsAuthentication, RoleRefreshToken
 from user.models import Medic, Patient, TimeSlot
+from user.otp import OneTimePasswords, OTPRateLimited
+from user.permissions import IsMedicOrAdmin, IsPatientOrAdmin
+from user.revocation import BloomFilter, RevocationList, get_revocation_list
 
 User = get_user_model()
 
@@ -14,6 +32,7 @@ User = get_user_model()
 class UserViewSetTests(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             phone_number='1234567890',
@@ -54,11 +73,10 @@ class UserViewSetTests(TestCase):
         response = self.client.post(url, {'phone_number': '1234567890'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('OTP sent successfully.', response.data)
-        self.assertTrue(cache.get('1234567890'))
+        self.assertTrue(OneTimePasswords().client.get('otp:code:1234567890'))
 
     def test_verify_otp(self):
-        otp_code = '123456'
-        cache.set('1234567890', otp_code, timeout=120)
+        otp_code = OneTimePasswords().issue('1234567890', '127.0.0.1')
 
         url = reverse('user-verify-otp')
         response = self.client.post(url, {
@@ -181,6 +199,227 @@ class UserViewSetTests(TestCase):
         self.assertEqual(self.patient.medical_history, 'Asthma')
 
 
+class OTPTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.otp = OneTimePasswords()
+
+    def send(self, phone_number='1234567890'):
+        return self.client.post(
+            reverse('user-send-otp'), {'phone_number': phone_number})
+
+    def test_cooldown_sends_no_sms(self):
+        with patch('user.views.send_sms') as send_sms:
+            self.assertEqual(self.send().status_code, status.HTTP_200_OK)
+            code = self.otp.client.get('otp:code:1234567890')
+
+            response = self.send()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(send_sms.call_count, 1)
+        self.assertEqual(self.otp.client.get('otp:code:1234567890'), code)
+
+    def test_unqueued_code_is_discarded(self):
+        with patch('user.views.send_sms', side_effect=OperationalError('broker down')):
+            response = self.send()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIsNone(self.otp.client.get('otp:code:1234567890'))
+
+        with patch('user.views.send_sms'):
+            self.assertEqual(self.send().status_code, status.HTTP_200_OK)
+
+    @override_settings(OTP_PHONE_LIMIT=2)
+    def test_sends_limited_per_phone_number(self):
+        for _ in range(2):
+            self.assertEqual(self.send().status_code, status.HTTP_200_OK)
+            self.otp.client.delete('otp:code:1234567890')
+
+        response = self.send()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.send('1234567891').status_code, status.HTTP_200_OK)
+
+    @override_settings(OTP_IP_LIMIT=2)
+    def test_sends_limited_per_ip(self):
+        self.assertEqual(self.send('1234567890').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.send('1234567891').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.send('1234567892').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_concurrent_wrong_guesses_are_all_counted(self):
+        code = self.otp.issue('1234567890', '127.0.0.1')
+        barrier = threading.Barrier(20)
+        results = []
+
+        def guess():
+            otp = OneTimePasswords()
+            barrier.wait()
+            try:
+                results.append(otp.verify('1234567890', '127.0.0.1', 'wrong'))
+            except OTPRateLimited:
+                results.append(None)
+
+        threads = [threading.Thread(target=guess) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(False), settings.OTP_PHONE_LIMIT)
+        self.assertEqual(results.count(None), 20 - settings.OTP_PHONE_LIMIT)
+        with self.assertRaises(OTPRateLimited):
+            self.otp.verify('1234567890', '127.0.0.1', code)
+
+    def test_valid_code_is_used_up(self):
+        code = self.otp.issue('1234567890', '127.0.0.1')
+        self.assertFalse(self.otp.verify('1234567890', '127.0.0.1', 'wrong'))
+        self.assertTrue(self.otp.verify('1234567890', '127.0.0.1', code))
+        self.assertFalse(self.otp.verify('1234567890', '127.0.0.1', code))
+
+
+class RoleClaimsAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='0987654321', is_medic=True),
+            specialization='hand', medical_system_number='245233')
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get(
+            '/', HTTP_AUTHORIZATION=f'JWT {token.access_token}')
+        user, _ = RoleClaimsAuthentication().authenticate(request)
+        request.user = user
+        return request
+
+    def test_token_carries_role_claims(self):
+        token = RoleRefreshToken.for_user(self.medic.user)
+        self.assertEqual(token.access_token['medic_id'], self.medic.id)
+        self.assertIsNone(token.access_token['patient_id'])
+        self.assertFalse(token.access_token['accepted'])
+
+    def test_permissions_without_queries(self):
+        token = RoleRefreshToken.for_user(self.medic.user)
+        with self.assertNumQueries(0):
+            request = self.authenticate(token)
+            self.assertFalse(IsMedicOrAdmin().has_permission(request, None))
+            self.assertFalse(IsPatientOrAdmin().has_permission(request, None))
+
+    def test_role_changes_take_effect_immediately(self):
+        token = RoleRefreshToken.for_user(self.medic.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medic.accepted = True
+            self.medic.save()
+
+        with self.assertNumQueries(1):
+            request = self.authenticate(token)
+        self.assertTrue(IsMedicOrAdmin().has_permission(request, None))
+
+        with self.assertNumQueries(0):
+            self.authenticate(token)
+
+    def test_entry_switches_roles(self):
+        Patient.objects.create(user=self.medic.user)
+        token = RoleRefreshToken.for_user(self.medic.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {token.access_token}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('user-patient-entry'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        request = self.authenticate(token)
+        self.assertTrue(IsPatientOrAdmin().has_permission(request, None))
+        self.assertFalse(request.user.is_medic)
+
+    def test_deleted_user(self):
+        token = RoleRefreshToken.for_user(self.medic.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medic.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_user_row_loads_at_once(self):
+        request = self.authenticate(RoleRefreshToken.for_user(self.medic.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(request.user.phone_number, '0987654321')
+            self.assertIsNone(request.user.first_name)
+
+
+class TokenRevocationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        get_revocation_list.cache_clear()
+        self.user = User.objects.create_user(phone_number='1234567890')
+        self.token = RoleRefreshToken.for_user(self.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {self.token.access_token}')
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.001)
+        for index in range(1000):
+            bloom.add(f'token-{index}')
+
+        self.assertTrue(all(f'token-{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 50)
+
+    def test_logout_revokes_tokens(self):
+        response = self.client.post(
+            reverse('user-logout'), {'refresh': str(self.token)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('user-me'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(
+            reverse('jwt-refresh'), {'refresh': str(self.token)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_account_cannot_refresh(self):
+        response = self.client.delete(reverse('user-me'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.post(
+            reverse('jwt-refresh'), {'refresh': str(self.token)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_valid_token_costs_no_round_trip(self):
+        revocations = RevocationList()
+        revocations.revoke_token('other', clock.time() + 60)
+        revocations.sync()
+        revocations.pid = os.getpid()
+
+        with patch.object(revocations.client, 'execute_command',
+                          side_effect=AssertionError('Redis was called.')):
+            self.assertFalse(revocations.is_revoked(
+                self.token['jti'], self.user.id, self.token['iat']))
+
+    def test_user_revocation_spares_later_tokens(self):
+        revocations = RevocationList()
+        with patch('user.revocation.clock.time', return_value=1000.5):
+            revocations.revoke_user(self.user.id)
+        self.assertTrue(revocations.is_revoked('jti', self.user.id, 1000))
+        self.assertFalse(revocations.is_revoked('jti', self.user.id, 1001))
+
+    def test_revocations_reach_other_processes(self):
+        listener = RevocationList()
+        listener.start()
+        for _ in range(50):
+            if listener.synced_at:
+                break
+            clock.sleep(0.1)
+
+        RevocationList().revoke_user(self.user.id)
+        for _ in range(50):
+            if str(self.user.id) in listener.not_before:
+                break
+            clock.sleep(0.1)
+
+        self.assertTrue(listener.is_revoked(
+            self.token['jti'], self.user.id, self.token['iat']))
+
+
 class PatientViewSetTest(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -326,3 +565,265 @@ class MedicAvailableTimeViewSetTest(APITestCase):
                       kwargs={'pk': self.timeslot.id})
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class MedicTimesMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='08944371845', is_medic=True),
+            specialization='backache', medical_system_number='12345', accepted=True)
+        self.other_medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='08984371845', is_medic=True),
+            specialization='hand', medical_system_number='54321', accepted=True)
+        self.clinic = Clinic.objects.create(
+            name='ali', clinic_serial='532', accepted=True)
+        self.patient = Patient.objects.create(
+            user=User.objects.create_user(phone_number='1122334455', is_patient=True))
+
+    def create_time(self, medic, day_of_week, capacity=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TimeSlot.objects.create(
+                medic=medic, clinic=self.clinic, day_of_week=day_of_week,
+                start_time=datetime_time(9), end_time=datetime_time(17),
+                avg_visit_time=10, avg_patient_visit=capacity)
+
+
+class MedicAppointmentTimesTest(MedicTimesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('medic-appointment-times', kwargs={'pk': self.medic.id})
+
+    def test_remaining_places_of_own_appointments(self):
+        time = self.create_time(self.medic, 0)
+        other_time = self.create_time(self.other_medic, 0, capacity=1)
+        book_appointment(time, self.patient)
+        book_appointment(other_time, self.patient)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['remaining'], 1)
+        self.assertEqual(response.data[0]['date'],
+                         next_appointment_date(time).isoformat())
+
+    def test_fully_booked_time_is_hidden(self):
+        time = self.create_time(self.medic, 0, capacity=1)
+        book_appointment(time, self.patient)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data, [])
+
+    def test_query_count_does_not_depend_on_weekdays(self):
+        self.create_time(self.medic, 0)
+
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+        for day_of_week in range(1, 7):
+            self.create_time(self.medic, day_of_week)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 7)
+
+
+class CachedAvailabilityTest(MedicTimesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('medic-appointment-times', kwargs={'pk': self.medic.id})
+        self.time = self.create_time(self.medic, 0)
+
+    def test_second_call_is_served_from_cache(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['remaining'], 2)
+
+    def test_booking_invalidates(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book_appointment(self.time, self.patient)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['remaining'], 1)
+
+    def test_moving_a_slot_invalidates_the_old_medic(self):
+        self.client.get(self.url)
+
+        time = TimeSlot.objects.get(id=self.time.id)
+        time.medic = self.other_medic
+        with self.captureOnCommitCallbacks(execute=True):
+            time.save()
+
+        self.assertEqual(self.client.get(self.url).data, [])
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            clock.sleep(0.3)
+            return 'availability'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                cached_availability(self.medic.id, 'stampede', compute)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['availability'] * 20)
+
+
+class MedicAvailabilityCalendarTest(MedicTimesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('medic-availability', kwargs={'pk': self.medic.id})
+
+    def test_remaining_places_per_week(self):
+        time = self.create_time(self.medic, 2)
+        first_date = next_appointment_date(time)
+        book_appointment(time, self.patient,
+                         date=first_date + timedelta(weeks=1))
+
+        response = self.client.get(self.url, {
+            'from': first_date.isoformat(),
+            'to': (first_date + timedelta(weeks=2)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        slot, = response.data['slots']
+        self.assertEqual(slot['first_date'], first_date)
+        self.assertEqual(slot['remaining'], [2, 1, 2])
+
+    def test_range_is_limited(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+
+        last = tomorrow + timedelta(weeks=settings.BOOKING_WINDOW_WEEKS, days=-1)
+
+        response = self.client.get(self.url, {
+            'from': tomorrow.isoformat(),
+            'to': last.isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['to'], last)
+
+        for params, field in [
+            ({'from': tomorrow.isoformat(), 'to': (last + timedelta(days=1)).isoformat()}, 'end'),
+            ({'from': timezone.localdate().isoformat()}, 'start'),
+            ({'from': (tomorrow + timedelta(weeks=2)).isoformat(),
+              'to': tomorrow.isoformat()}, 'end'),
+        ]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+
+    def test_query_count_does_not_depend_on_weekdays(self):
+        for day_of_week in range(7):
+            self.create_time(self.medic, day_of_week)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['slots']), 7)
+
+
+class EarliestAvailableTest(MedicTimesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('medic-earliest')
+        self.other_clinic = Clinic.objects.create(
+            name='reza', clinic_serial='533', accepted=True)
+        self.third_medic = Medic.objects.create(
+            user=User.objects.create_user(phone_number='08974371845', is_medic=True),
+            specialization='backache', medical_system_number='67890', accepted=True)
+
+    def test_earliest_slots_across_medics(self):
+        today = timezone.localdate().weekday()
+        soon = self.create_time(self.medic, (today + 2) % 7, capacity=1)
+        later = self.create_time(self.third_medic, (today + 4) % 7)
+        self.create_time(self.other_medic, (today + 1) % 7)
+        book_appointment(soon, self.patient)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, {'specialization': 'Backache', 'limit': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([slot['id'] for slot in response.data],
+                         [later.id, soon.id, later.id])
+        self.assertEqual(response.data[0]['date'],
+                         next_appointment_date(later).isoformat())
+
+    def test_clinic_filter(self):
+        time = self.create_time(self.medic, 0)
+        elsewhere = self.create_time(self.third_medic, 1)
+        elsewhere.clinic = self.other_clinic
+        elsewhere.save()
+
+        response = self.client.get(self.url, {
+            'specialization': 'backache', 'clinic': self.clinic.id})
+
+        self.assertEqual({slot['id'] for slot in response.data}, {time.id})
+
+    def test_specialization_is_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ListQueryCountTest(MedicTimesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser(
+            phone_number='09123456388', password='34')
+
+    def assertConstantQueries(self, url, add_rows):
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+
+        add_rows()
+
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first), len(second))
+
+    def test_patient_list(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+        def add_rows():
+            for index in range(5):
+                Patient.objects.create(user=User.objects.create_user(
+                    phone_number=f'0935{index:07}', is_patient=True))
+
+        self.assertConstantQueries(reverse('patient-list'), add_rows)
+
+    def test_medic_list(self):
+        def add_rows():
+            for index in range(5):
+                Medic.objects.create(
+                    user=User.objects.create_user(phone_number=f'0935{index:07}'),
+                    specialization='hand', medical_system_number=str(index), accepted=True)
+
+        self.assertConstantQueries(reverse('medic-list'), add_rows)
+
+    def test_available_times_list(self):
+        self.client.force_authenticate(user=self.medic.user)
+        self.create_time(self.medic, 0)
+
+        def add_rows():
+            for day_of_week in range(1, 6):
+                self.create_time(self.medic, day_of_week)
+
+        self.assertConstantQueries(reverse('availabe_times-list'), add_rows)
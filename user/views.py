@@ -1,27 +1,30 @@
-import random
-from datetime import datetime, timedelta, time as datetime_time
-
-from django.core.cache import cache
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.utils import timezone
+from kombu.exceptions import OperationalError
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.views import Response, status
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework.mixins import ListModelMixin, CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
 from rest_framework.decorators import api_view
-from rest_framework.exceptions import ValidationError
-
-from appointment.models import Appointment
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from appointment.availability import cached_availability, earliest_available, medic_availability, medic_calendar
+from appointment_system.sparse import SparseFieldsViewMixin
+from appointment_system.streaming import StreamingListMixin
+from sms.dispatch import send_sms
 from user.permissions import IsMedicOrAdmin, IsOwnerOrAdmin
 
-from .utils import increment_failed_attemps_otp, is_blocked, send_sms
-from .serializers import CREATEMedicAvailableTimeSerializer, CreateMedicUserSerializer, CreatePatientUserSerializer, GETMedicAvailableTimeSerializer, MedicOrPatientSerializers, UpdateMedicUserSerializer, PatientSerializer, UpdatePatientUserSerializer, SendOTPSerializer, UPDATEMedicAvailableTimeSerializer, UserSerializer, VerifyOTPSerializer, MedicSerializer
+from .authentication import RoleRefreshToken, revoke_token, revoke_user_tokens
+from .otp import OneTimePasswords, OTPCooldown, OTPRateLimited
+from .serializers import AvailabilityRangeSerializer, CREATEMedicAvailableTimeSerializer, CreateMedicUserSerializer, CreatePatientUserSerializer, EarliestAvailableSerializer, GETMedicAppointmentTimeSerializer, GETMedicAvailableTimeSerializer, MedicOrPatientSerializers, UpdateMedicUserSerializer, PatientSerializer, UpdatePatientUserSerializer, SendOTPSerializer, UPDATEMedicAvailableTimeSerializer, UserSerializer, VerifyOTPSerializer, MedicSerializer
 from .models import Medic, Patient, TimeSlot, User
 
 
-class UserViewSet(ListModelMixin, GenericViewSet):
+class UserViewSet(StreamingListMixin, SparseFieldsViewMixin, ListModelMixin, GenericViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
@@ -32,19 +35,21 @@ class UserViewSet(ListModelMixin, GenericViewSet):
         serializer.is_valid(raise_exception=True)
         phone_number = serializer.validated_data['phone_number']
 
-        otp_code = random.randint(100000, 999999)
-        print(otp_code)
-
-        # send SMS function
-        send_sms(phone_number)
-        
-        old_otp = cache.get(phone_number)
-        if old_otp:
+        otps = OneTimePasswords()
+        try:
+            otp_code = otps.issue(phone_number, request.META.get('REMOTE_ADDR'))
+        except OTPCooldown:
             return Response(f"You already receive otp code. Please try again later",
                             status=status.HTTP_403_FORBIDDEN)
+        except OTPRateLimited as error:
+            raise Throttled(wait=error.wait)
 
-        cache.set(phone_number, str(otp_code),
-                  timeout=120)  # ttl 2 minwute
+        try:
+            send_sms(phone_number, f'Your verification code is {otp_code}')
+        except OperationalError:
+            otps.discard(phone_number)
+            return Response('OTP could not be sent. Please try again later.',
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         return Response('OTP sent successfully.', status=status.HTTP_200_OK)
 
@@ -56,19 +61,17 @@ class UserViewSet(ListModelMixin, GenericViewSet):
         phone_number = serializer.validated_data['phone_number']
         otp_code = serializer.validated_data['otp_code']
 
-        if is_blocked(phone_number):
+        try:
+            verified = OneTimePasswords().verify(
+                phone_number, request.META.get('REMOTE_ADDR'), otp_code)
+        except OTPRateLimited:
             return Response('Too many failed attempts. Please try again later.', status=status.HTTP_403_FORBIDDEN)
 
-        stored_otp = cache.get(phone_number)
-        if stored_otp and stored_otp == otp_code:
-
-            cache.delete(phone_number)
-            cache.delete(f'failed_attempts_{phone_number}')
-
+        if verified:
             user, created = User.objects.get_or_create(
                 phone_number=phone_number)
 
-            refresh = RefreshToken.for_user(user)
+            refresh = RoleRefreshToken.for_user(user)
 
             if created:
                 return Response({
@@ -81,9 +84,24 @@ class UserViewSet(ListModelMixin, GenericViewSet):
                 'access': str(refresh.access_token),
             }, status=status.HTTP_202_ACCEPTED)
 
-        increment_failed_attemps_otp(phone_number)
         return Response('Please enter a valid code')
 
+    @action(detail=False, methods=['POST'], permission_classes=[IsAuthenticated], url_path='logout')
+    def logout(self, request):
+        if request.auth is not None:
+            revoke_token(request.auth)
+
+        if request.data.get('refresh'):
+            try:
+                refresh = RoleRefreshToken(request.data['refresh'])
+            except TokenError:
+                refresh = None
+            if refresh is not None \
+                    and refresh.get(api_settings.USER_ID_CLAIM) == request.user.id:
+                revoke_token(refresh)
+
+        return Response('You logged out.', status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['GET'], permission_classes=[IsAuthenticated], url_path='medic_or_patient')
     def medic_or_patient(self, request):
         user = request.user
@@ -166,17 +184,20 @@ class UserViewSet(ListModelMixin, GenericViewSet):
                 serializer.save()
 
         elif self.request.method == 'DELETE':
+            user_id = user.id
             user.delete()
+            revoke_user_tokens(user_id)
             return Response('You deleted your account.', status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PatientViewSet(ListModelMixin,
+class PatientViewSet(SparseFieldsViewMixin,
+                     ListModelMixin,
                      CreateModelMixin,
                      DestroyModelMixin,
                      GenericViewSet):
-    queryset = Patient.objects.all()
+    queryset = Patient.objects.select_related('user')
     serializer_class = PatientSerializer
 
     def perform_create(self, serializer):
@@ -238,7 +259,8 @@ class PatientViewSet(ListModelMixin,
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class MedicViewSet(ListModelMixin,
+class MedicViewSet(SparseFieldsViewMixin,
+                   ListModelMixin,
                    RetrieveModelMixin,
                    CreateModelMixin,
                    DestroyModelMixin,
@@ -250,9 +272,9 @@ class MedicViewSet(ListModelMixin,
         user = self.request.user
 
         if user.is_staff or user.is_superuser:
-            return Medic.objects.all()
+            return Medic.objects.select_related('user')
 
-        return Medic.objects.filter(accepted=True)
+        return Medic.objects.select_related('user').filter(accepted=True)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -306,37 +328,69 @@ class MedicViewSet(ListModelMixin,
 
     @action(detail=True, methods=['GET'], permission_classes=[AllowAny], url_path='appointment_times')
     def appointment_times(slef, request, pk):
-        medic = get_object_or_404(Medic, id=pk)
-        times = TimeSlot.objects.filter(medic=medic, is_active=True)
-        availvable_times = []
-        days_of_week = []
-        for time in times:
-            days_of_week.append(time.day_of_week)
-
-        today = datetime.now()
-        for day_of_week in days_of_week:
-            day_difference = day_of_week - today.weekday()
-            if day_difference <= 0:
-                day_difference += 7
-
-            time_zero = datetime_time()
-            day = datetime.combine(today.date(), time_zero)
-
-            appointmented_count = Appointment.objects.filter(
-                Q(appointment_datetime__gt=day+timedelta(days=day_difference)) &
-                Q(appointment_datetime__lt=day+timedelta(days=day_difference+1)))\
-                .count()
-
-            weekday_appointment = times.get(day_of_week=day_of_week)
-            if appointmented_count < weekday_appointment.avg_patient_visit:
-                availvable_times.append(weekday_appointment)
-
-        serializer = GETMedicAvailableTimeSerializer(
-            availvable_times, many=True)
+        if not pk.isdigit():
+            raise Http404
+
+        def available_times():
+            medic = get_object_or_404(Medic, id=pk)
+
+            availvable_times = [time for time in medic_availability(medic)
+                                if time.remaining > 0]
+
+            serializer = GETMedicAppointmentTimeSerializer(
+                availvable_times, many=True)
+            return serializer.data
+
+        data = cached_availability(
+            int(pk), f'times:{timezone.localdate()}', available_times)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['GET'], permission_classes=[AllowAny], url_path='earliest')
+    def earliest(self, request):
+        serializer = EarliestAvailableSerializer(data={
+            'start': request.query_params.get('from'),
+            'end': request.query_params.get('to'),
+            'specialization': request.query_params.get('specialization'),
+            'clinic': request.query_params.get('clinic'),
+            'limit': request.query_params.get('limit'),
+        })
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        times = earliest_available(
+            data['specialization'], data['start'], data['end'],
+            clinic=data.get('clinic'), limit=data.get('limit') or 10)
+
+        serializer = GETMedicAppointmentTimeSerializer(times, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['GET'], permission_classes=[AllowAny], url_path='availability')
+    def availability(self, request, pk):
+        if not pk.isdigit():
+            raise Http404
+
+        serializer = AvailabilityRangeSerializer(data={
+            'start': request.query_params.get('from'),
+            'end': request.query_params.get('to'),
+        })
+        serializer.is_valid(raise_exception=True)
+        start = serializer.validated_data['start']
+        end = serializer.validated_data['end']
+
+        def calendar():
+            medic = get_object_or_404(Medic, id=pk)
+
+            return {
+                'from': start,
+                'to': end,
+                'slots': medic_calendar(medic, start, end),
+            }
+
+        data = cached_availability(int(pk), f'calendar:{start}:{end}', calendar)
+        return Response(data, status=status.HTTP_200_OK)
+
 
-class MedicAvailableTimeViewSet(ModelViewSet):
+class MedicAvailableTimeViewSet(SparseFieldsViewMixin, ModelViewSet):
     permission_classes = [IsMedicOrAdmin]
 
     def get_serializer_class(self, *args, **kwargs):
@@ -349,13 +403,12 @@ class MedicAvailableTimeViewSet(ModelViewSet):
     def get_queryset(self):
         user = self.request.user
 
+        times = TimeSlot.objects.select_related('medic__user', 'clinic')
+
         if user.is_staff:
-            return TimeSlot.objects.all()
+            return times
 
-        user = User.objects.get(id=user.id)
-        medic = Medic.objects.select_related('user').get(user=user)
-        times = TimeSlot.objects.select_related('medic').filter(medic=medic)
-        return times
+        return times.filter(medic__user=user)
 
     def perform_create(self, serializer):
         serializer.save(medic=self.request.user.medic)